@@ -0,0 +1,152 @@
+from collections.abc import Callable, Sequence
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any
+
+import pandas as pd
+import pyarrow as pa
+from sqlalchemy import Date, Numeric, Select, String, type_coerce
+from sqlalchemy.engine import Connection
+from sqlalchemy.types import Enum as SQLEnum
+
+ARROW_TYPES = {
+    bool: pa.bool_(),
+    int: pa.int64(),
+    float: pa.float64(),
+    Decimal: pa.float64(),
+    str: pa.string(),
+    date: pa.date32(),
+    datetime: pa.timestamp("us"),
+}
+
+
+def null_type(col_type):
+    """Arrow type for a column without values to infer it from"""
+    try:
+        python_type = col_type.python_type
+    except NotImplementedError:
+        return pa.null()
+    return ARROW_TYPES.get(python_type, pa.null())
+
+
+def enum_labels(col_type: SQLEnum) -> dict[str, Any]:
+    """Value shown for each string stored in the database"""
+    members = col_type.enum_class or col_type.enums
+    labels = [getattr(member, "value", member) for member in members]
+    return dict(zip(col_type.enums, labels, strict=True))
+
+
+def enum_array(values: Sequence[Any], col_type: SQLEnum):
+    """Dictionary encoded column of the enum values
+
+    values are the strings stored in the database, so only the dictionary is
+    converted to the enum values, not each row.
+    """
+    label_by_db = enum_labels(col_type)
+
+    encoded = pa.array(values, type=pa.string()).dictionary_encode()
+    dictionary = [label_by_db.get(v, v) for v in encoded.dictionary.to_pylist()]
+    return pa.DictionaryArray.from_arrays(encoded.indices, pa.array(dictionary))
+
+
+def raw_enums(stmt: Select):
+    """Read enum columns as the stored strings, skipping per row conversion"""
+    cols = [
+        type_coerce(col, String).label(col.name)
+        if isinstance(col.type, SQLEnum)
+        else col
+        for col in stmt.selected_columns
+    ]
+    return stmt.with_only_columns(*cols)
+
+
+def to_array(values: Sequence[Any], col_type):
+    if isinstance(col_type, SQLEnum):
+        return enum_array(values, col_type)
+
+    try:
+        arr = pa.array(values)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        arr = pa.array([None if v is None else str(v) for v in values])
+
+    if pa.types.is_null(arr.type):
+        arr = arr.cast(null_type(col_type))
+
+    # Same as pd.read_sql, that turns Decimal into float
+    if pa.types.is_decimal(arr.type):
+        arr = arr.cast(pa.float64())
+    return arr
+
+
+def fetch_table(conn: Connection, stmt: Select) -> pa.Table:
+    """Page rows as a pyarrow Table built column by column from the cursor"""
+    result = conn.execute(raw_enums(stmt))
+    colsname = list(result.keys())
+    rows = result.all()
+
+    col_types = [col.type for col in stmt.selected_columns]
+    cols_values = list(zip(*rows, strict=True)) or [() for _ in colsname]
+    arrays = [
+        to_array(values, col_type)
+        for values, col_type in zip(cols_values, col_types, strict=True)
+    ]
+    return pa.Table.from_arrays(arrays, names=colsname)
+
+
+def read_page(conn: Connection, stmt: Select, arrow_fetch: bool = False):
+    if arrow_fetch:
+        return to_pandas(fetch_table(conn, stmt))
+    return pd.read_sql(raw_enums(stmt), conn)
+
+
+def types_mapper(arrow_type: pa.DataType):
+    # Dictionary columns are left to become pandas categoricals
+    if pa.types.is_dictionary(arrow_type):
+        return None
+    return pd.ArrowDtype(arrow_type)
+
+
+def to_pandas(table: pa.Table) -> pd.DataFrame:
+    """Arrow backed DataFrame, without object dtype columns"""
+    return table.to_pandas(types_mapper=types_mapper)
+
+
+def enum_coercion(col_type: SQLEnum):
+    label_by_db = enum_labels(col_type)
+
+    def coerce(serie: pd.Series):
+        cat = pd.Categorical(serie, categories=list(label_by_db))
+        return pd.Series(cat.rename_categories(label_by_db), index=serie.index)
+
+    return coerce
+
+
+def numeric_coercion(serie: pd.Series):
+    return pd.to_numeric(serie, errors="coerce").astype("float64")
+
+
+def date_coercion(serie: pd.Series):
+    return pd.to_datetime(serie)
+
+
+def col_coercion(col_type) -> Callable[[pd.Series], pd.Series] | None:
+    """Vectorized converter of a column of a DataFrame read with raw_enums
+
+    Enums become categoricals of their values, Numeric float64 and dates
+    datetime64. Columns of other types are left as read.
+    """
+    if isinstance(col_type, SQLEnum):
+        return enum_coercion(col_type)
+    if isinstance(col_type, Numeric):
+        return numeric_coercion
+    if isinstance(col_type, Date):
+        return date_coercion
+    return None
+
+
+def coerce(df: pd.DataFrame, coercions: dict[str, Callable[[pd.Series], pd.Series]]):
+    for colname, coercion in coercions.items():
+        if colname in df.columns:
+            df[colname] = coercion(df[colname])
+
+    return df
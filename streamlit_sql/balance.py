@@ -0,0 +1,264 @@
+import threading
+from bisect import bisect_right
+from collections import OrderedDict
+from functools import cmp_to_key
+from typing import Any
+
+import streamlit as st
+from sqlalchemy import CTE, Select, Subquery, Table, func
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.util import find_tables
+
+from streamlit_sql import keyset, read_cte
+from streamlit_sql.cache import fingerprint
+
+SCAN_BATCH = 1000
+CHECKPOINT_INDEXES = 200
+
+
+def get_table_name(col) -> str | None:
+    """Name of the table a CTE or subquery column comes from"""
+    if col is None:
+        return None
+
+    base_cols = [
+        c for c in col.proxy_set if isinstance(getattr(c, "table", None), Table)
+    ]
+    if len(base_cols) == 0:
+        return None
+
+    return base_cols[0].table.name
+
+
+class BalanceIndex:
+    """Prefix sums of rolling_total_column every N rows of a filtered statement
+
+    A checkpoint (key, prefix) holds the sum of every row ordered before key, so
+    it stays valid when rows are added or removed, only the prefix is patched.
+    The opening balance of a row is the nearest checkpoint before it plus a SUM
+    bounded to the rows in between. Checkpoints are built incrementally, scanning
+    only past the last one when a page beyond it is requested.
+    """
+
+    def __init__(
+        self,
+        from_: CTE | Subquery,
+        keys: list[tuple[str, bool]],
+        stmt_no_pag_dt: Select,
+        rolling_total_column: str,
+        every: int,
+    ) -> None:
+        self.from_ = from_
+        self.keys = keys
+        self.stmt_no_pag_dt = stmt_no_pag_dt
+        self.rolling_col = from_.columns[rolling_total_column]
+        self.every = every
+
+        self.key_cols = [from_.columns[colname] for colname, _ in keys]
+        self.id_col = from_.columns.get("id")
+        self.id_table = get_table_name(self.id_col)
+        self.tables = {
+            t.name for t in find_tables(stmt_no_pag_dt) if isinstance(t, Table)
+        }
+        self.sort_key = cmp_to_key(self.compare)
+        self.checkpoints: list[tuple[tuple, float]] = []
+        self.lock = threading.Lock()
+
+    def compare(self, a: tuple, b: tuple):
+        return keyset.compare_keys(self.keys, a, b)
+
+    def floor(self, values: tuple):
+        """Position after the last checkpoint ordered before or at values"""
+        pos = bisect_right(
+            self.checkpoints,
+            self.sort_key(values),
+            key=lambda cp: self.sort_key(cp[0]),
+        )
+        return pos
+
+    def add_checkpoint(self, values: tuple, prefix: float):
+        pos = self.floor(values)
+        if pos > 0 and self.compare(self.checkpoints[pos - 1][0], values) == 0:
+            self.checkpoints[pos - 1] = (values, prefix)
+        else:
+            self.checkpoints.insert(pos, (values, prefix))
+
+    def stmt_between(self, columns: list, start: tuple | None, end: tuple):
+        stmt = self.stmt_no_pag_dt.with_only_columns(*columns)
+        if start is not None:
+            stmt = stmt.where(
+                keyset.seek_cond(self.from_, self.keys, start, True, True)
+            )
+        stmt = stmt.where(keyset.seek_cond(self.from_, self.keys, end, False, False))
+        return stmt
+
+    def scan(self, session: Session, start: tuple | None, prefix: float, end: tuple):
+        stmt = self.stmt_between([*self.key_cols, self.rolling_col], start, end)
+        stmt = stmt.order_by(*keyset.key_orderby(self.from_, self.keys))
+        stmt = stmt.execution_options(yield_per=SCAN_BATCH)
+
+        for i, row in enumerate(session.execute(stmt)):
+            if i > 0 and i % self.every == 0:
+                self.add_checkpoint(tuple(row[:-1]), prefix)
+            prefix += float(row[-1] or 0)
+
+        self.add_checkpoint(end, prefix)
+        return prefix
+
+    def bounded_sum(self, session: Session, start: tuple, prefix: float, end: tuple):
+        stmt = self.stmt_between([func.sum(self.rolling_col)], start, end)
+        bal = session.execute(stmt).scalar_one() or 0
+        return prefix + float(bal)
+
+    def opening_balance(self, session: Session, values: tuple) -> float:
+        with self.lock:
+            pos = self.floor(values)
+            start, prefix = self.checkpoints[pos - 1] if pos > 0 else (None, 0.0)
+            if start is not None and self.compare(start, values) == 0:
+                return prefix
+            if start is not None and pos < len(self.checkpoints):
+                return self.bounded_sum(session, start, prefix, values)
+
+            return self.scan(session, start, prefix, values)
+
+    def get_rows(self, session: Session, rows_id: list[int]):
+        assert self.id_col is not None
+        cols = [self.id_col, *self.key_cols, self.rolling_col]
+        stmt = self.stmt_no_pag_dt.with_only_columns(*cols)
+        stmt = stmt.where(self.id_col.in_(rows_id))
+        rows = {
+            row[0]: (tuple(row[1:-1]), float(row[-1] or 0))
+            for row in session.execute(stmt)
+        }
+        return rows
+
+    def patch(self, values: tuple, amount: float):
+        """Add amount to every checkpoint after values"""
+        pos = self.floor(values)
+        for i in range(pos, len(self.checkpoints)):
+            cp_values, prefix = self.checkpoints[i]
+            if self.compare(cp_values, values) > 0:
+                self.checkpoints[i] = (cp_values, prefix + amount)
+
+
+class CheckpointStore:
+    """BalanceIndex of each filtered statement, least recently used first out"""
+
+    def __init__(self, max_indexes: int = CHECKPOINT_INDEXES) -> None:
+        self.max_indexes = max_indexes
+        self.indexes: OrderedDict[Any, BalanceIndex] = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get_index(
+        self,
+        from_: CTE | Subquery,
+        keys: list[tuple[str, bool]],
+        stmt_no_pag_dt: Select,
+        rolling_total_column: str,
+        every: int,
+    ):
+        index_key = (
+            fingerprint(stmt_no_pag_dt),
+            tuple(keys),
+            rolling_total_column,
+            every,
+        )
+        with self.lock:
+            index = self.indexes.get(index_key)
+            if index is not None:
+                self.indexes.move_to_end(index_key)
+            else:
+                index = BalanceIndex(
+                    from_, keys, stmt_no_pag_dt, rolling_total_column, every
+                )
+                self.indexes[index_key] = index
+                while len(self.indexes) > self.max_indexes:
+                    self.indexes.popitem(last=False)
+
+        return index
+
+    def related(self, table_name: str):
+        with self.lock:
+            return [
+                (index_key, index)
+                for index_key, index in self.indexes.items()
+                if table_name in index.tables
+            ]
+
+    def snapshot(self, session: Session, table_name: str, rows_id: list[int]):
+        """Rows keys and amounts in each related index, before they are changed"""
+        before = {}
+        for index_key, index in self.related(table_name):
+            if table_name != index.id_table:
+                continue
+
+            try:
+                before[index_key] = index.get_rows(session, rows_id)
+            except SQLAlchemyError:
+                self.drop(index_key)
+
+        return before
+
+    def patch(
+        self,
+        session: Session,
+        table_name: str,
+        rows_id: list[int],
+        before: dict | None = None,
+    ):
+        """Patch checkpoints after changed rows. Call after commit.
+
+        Indexes that only join the changed table, or lack an id column, are
+        dropped since the changed rows can't be located in them.
+        """
+        before = before or {}
+        for index_key, index in self.related(table_name):
+            if table_name != index.id_table:
+                self.drop(index_key)
+                continue
+
+            try:
+                after = index.get_rows(session, rows_id)
+            except SQLAlchemyError:
+                self.drop(index_key)
+                continue
+
+            with index.lock:
+                for values, amount in before.get(index_key, {}).values():
+                    index.patch(values, -amount)
+                for values, amount in after.values():
+                    index.patch(values, amount)
+
+    def drop(self, index_key):
+        with self.lock:
+            self.indexes.pop(index_key, None)
+
+    def drop_table(self, table_name: str):
+        """Drop indexes reading from table, for changes too many to patch"""
+        for index_key, _ in self.related(table_name):
+            self.drop(index_key)
+
+
+@st.cache_resource
+def get_store():
+    return CheckpointStore()
+
+
+def opening_balance(
+    session: Session,
+    from_: CTE | Subquery,
+    keys: list[tuple[str, bool]],
+    stmt_no_pag_dt: Select,
+    stmt_pag: Select,
+    rolling_total_column: str,
+    every: int,
+) -> float:
+    first_values = read_cte.get_first_values(session, from_, keys, stmt_pag)
+    if first_values is None:
+        return 0
+
+    store = get_store()
+    index = store.get_index(from_, keys, stmt_no_pag_dt, rolling_total_column, every)
+    bal = index.opening_balance(session, first_values)
+    return bal
@@ -0,0 +1,227 @@
+import functools
+import inspect
+import pickle
+import sys
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from collections.abc import Callable, Hashable, Iterable
+from typing import Any
+
+import pandas as pd
+import streamlit as st
+from sqlalchemy import Table, select, table
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.sql import column
+from sqlalchemy.sql.elements import ClauseElement
+from sqlalchemy.sql.util import find_tables
+
+CACHE_MAX_ENTRIES = 2000
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+VERSION_POLL_SECONDS = 5
+SIZE_SAMPLE = 200
+
+
+class TableVersions:
+    """Version number of each table, bumped on every change made by this package
+
+    Optionally merged with versions polled from a table in the database, with
+    columns table_name and version, that triggers or other apps can increment.
+    """
+
+    def __init__(self) -> None:
+        self.versions: dict[str, int] = {}
+        self.external: dict[str, Any] = {}
+        self.last_poll = 0.0
+        self.lock = threading.Lock()
+
+    def get(self, tables: Iterable[str]):
+        with self.lock:
+            versions = tuple(
+                (name, self.versions.get(name, 0), self.external.get(name))
+                for name in sorted(tables)
+            )
+        return versions
+
+    def bump(self, *tables: str):
+        with self.lock:
+            for name in tables:
+                self.versions[name] = self.versions.get(name, 0) + 1
+
+    def poll(self, engine: Engine, version_table: str):
+        now = time.monotonic()
+        with self.lock:
+            if now - self.last_poll < VERSION_POLL_SECONDS:
+                return
+            self.last_poll = now
+
+        versions_tbl = table(version_table, column("table_name"), column("version"))
+        stmt = select(versions_tbl.c.table_name, versions_tbl.c.version)
+        try:
+            with engine.connect() as c:
+                rows = c.execute(stmt).all()
+        except SQLAlchemyError:
+            return
+
+        with self.lock:
+            self.external = {row[0]: row[1] for row in rows}
+
+
+class SharedCache:
+    """Process wide LRU cache, bounded by entries and approximate size"""
+
+    def __init__(self, max_entries: int, max_bytes: int) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries: OrderedDict[Any, tuple[Any, int]] = OrderedDict()
+        self.nbytes = 0
+        self.lock = threading.Lock()
+
+    def get(self, key) -> tuple[bool, Any]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return False, None
+            self.entries.move_to_end(key)
+            return True, entry[0]
+
+    def set(self, key, value):
+        size = get_size(value)
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.nbytes -= old[1]
+
+            self.entries[key] = (value, size)
+            self.nbytes += size
+            while len(self.entries) > 1 and (
+                len(self.entries) > self.max_entries or self.nbytes > self.max_bytes
+            ):
+                _, (_, evicted_size) = self.entries.popitem(last=False)
+                self.nbytes -= evicted_size
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.nbytes = 0
+
+
+def get_size(value) -> int:
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, list) and len(value) > SIZE_SAMPLE:
+        # Long lists, like ForeignKey options, are estimated from a sample
+        return get_size(value[:SIZE_SAMPLE]) * len(value) // SIZE_SAMPLE
+    try:
+        return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    except (pickle.PicklingError, TypeError, AttributeError):
+        return sys.getsizeof(value)
+
+
+@st.cache_resource
+def get_table_versions():
+    return TableVersions()
+
+
+@st.cache_resource
+def get_shared_cache():
+    return SharedCache(CACHE_MAX_ENTRIES, CACHE_MAX_BYTES)
+
+
+def bump_tables(*tables: str):
+    get_table_versions().bump(*tables)
+
+
+_fingerprints: weakref.WeakKeyDictionary[ClauseElement, Hashable] = (
+    weakref.WeakKeyDictionary()
+)
+_fingerprints_lock = threading.Lock()
+
+
+def fingerprint(stmt: ClauseElement) -> Hashable:
+    """Key of a statement, equal for statements with the same structure and values
+
+    Uses the sqlalchemy cache key plus bound values, computed once per statement
+    object. Statements without a cache key are compiled once instead.
+    """
+    with _fingerprints_lock:
+        key = _fingerprints.get(stmt)
+    if key is not None:
+        return key
+
+    cache_key = stmt._generate_cache_key()
+    if cache_key is None:
+        compiled = stmt.compile()
+        key = (str(compiled), repr(compiled.params))
+    else:
+        values = [bind.effective_value for bind in cache_key.bindparams]
+        key = (cache_key.key, repr(values))
+
+    with _fingerprints_lock:
+        _fingerprints[stmt] = key
+    return key
+
+
+def statement_tables(stmt) -> set[str]:
+    tables = {t.name for t in find_tables(stmt) if isinstance(t, Table)}
+    return tables
+
+
+def shared_cache(
+    tables: Callable[..., Iterable[str]],
+    hash_funcs: dict[Any, Callable[[Any], Any]] | None = None,
+):
+    """Cache results for all sessions until a table they read from changes
+
+    Works like st.cache_data: arguments starting with underscore are not part of
+    the key and hash_funcs turns unhashable arguments into keys. tables receives
+    the same arguments and returns the table names the result depends on.
+    Results are shared, so callers must not mutate them.
+    """
+    hash_funcs = hash_funcs or {}
+
+    def decorator(fn):
+        signature = inspect.signature(fn)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            args_key = tuple(
+                (name, hash_arg(value, hash_funcs))
+                for name, value in bound.arguments.items()
+                if not name.startswith("_")
+            )
+            versions = get_table_versions().get(tables(**bound.arguments))
+            key = (fn.__module__, fn.__qualname__, args_key, versions)
+
+            cache = get_shared_cache()
+            found, value = cache.get(key)
+            if found:
+                return value
+
+            value = fn(*args, **kwargs)
+            cache.set(key, value)
+            return value
+
+        return wrapper
+
+    return decorator
+
+
+def hash_arg(value, hash_funcs: dict[Any, Callable[[Any], Any]]):
+    for type_, hash_func in hash_funcs.items():
+        if isinstance(type_, type) and isinstance(value, type_):
+            value = hash_func(value)
+            break
+
+    if isinstance(value, Hashable):
+        try:
+            hash(value)
+            return value
+        except TypeError:
+            pass
+
+    return repr(value)
@@ -0,0 +1,115 @@
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from dataclasses import dataclass
+from datetime import date
+from decimal import Decimal
+from typing import Literal
+
+import pandas as pd
+from sqlalchemy import CTE
+from sqlalchemy.sql.elements import KeyedColumnElement
+from sqlalchemy.types import Enum as SQLEnum
+
+from streamlit_sql import arrow
+from streamlit_sql.cache import fingerprint
+from streamlit_sql.lib import get_pretty_name
+
+COLUMNS_ENTRIES = 500
+
+ColKind = Literal["date", "str", "enum", "bool", "fk", "int", "numeric", "other"]
+
+# Kinds whose filter lists the existing values of the column
+LISTED_KINDS = ("str", "enum", "bool")
+
+
+@dataclass(frozen=True)
+class ColMeta:
+    name: str
+    label: str
+    kind: ColKind
+    primary_key: bool
+    coercion: Callable[[pd.Series], pd.Series] | None
+
+    @property
+    def listed(self) -> bool:
+        return not self.primary_key and self.kind in LISTED_KINDS
+
+
+def col_kind(col: KeyedColumnElement) -> ColKind:
+    if isinstance(col.type, SQLEnum):
+        return "enum"
+    if len(col.foreign_keys) > 0:
+        return "fk"
+
+    try:
+        python_type = col.type.python_type
+    except NotImplementedError:
+        return "other"
+
+    if python_type is date:
+        return "date"
+    if python_type is str:
+        return "str"
+    if python_type is bool:
+        return "bool"
+    if python_type is int:
+        return "int"
+    if python_type in (float, Decimal):
+        return "numeric"
+    return "other"
+
+
+class CteColumns:
+    """Columns of a CTE classified once, read by filters, discovery and coercion"""
+
+    def __init__(self, cte: CTE) -> None:
+        self.cols: dict[str, ColMeta] = {}
+        for col in cte.columns:
+            colname = col.description
+            if not colname:
+                continue
+
+            self.cols[colname] = ColMeta(
+                name=colname,
+                label=get_pretty_name(colname),
+                kind=col_kind(col),
+                primary_key=col.primary_key,
+                coercion=arrow.col_coercion(col.type),
+            )
+
+        self.coercions = {
+            colname: meta.coercion
+            for colname, meta in self.cols.items()
+            if meta.coercion is not None
+        }
+
+    def __getitem__(self, colname: str) -> ColMeta:
+        return self.cols[colname]
+
+    def select(self, colsname: list[str] | None = None) -> list[ColMeta]:
+        """Metadata of colsname in the CTE order, all columns if empty"""
+        if not colsname:
+            return list(self.cols.values())
+        return [meta for meta in self.cols.values() if meta.name in colsname]
+
+
+_columns: OrderedDict[Hashable, CteColumns] = OrderedDict()
+_columns_lock = threading.Lock()
+
+
+def get_columns(cte: CTE) -> CteColumns:
+    """Metadata of cte, shared by the CTEs with the same fingerprint"""
+    key = fingerprint(cte)
+    with _columns_lock:
+        cols = _columns.get(key)
+        if cols is not None:
+            _columns.move_to_end(key)
+            return cols
+
+    cols = CteColumns(cte)
+    with _columns_lock:
+        _columns[key] = cols
+        while len(_columns) > COLUMNS_ENTRIES:
+            _columns.popitem(last=False)
+    return cols
@@ -0,0 +1,119 @@
+import sys
+from dataclasses import dataclass
+from typing import Any
+
+from sqlalchemy import ColumnElement, or_
+
+
+class NotNull:
+    """Option of multi-value filters that keeps the rows with any value
+
+    Streamlit deep copies widget values, so instances compare equal instead
+    of relying on identity.
+    """
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, NotNull)
+
+    def __hash__(self) -> int:
+        return hash(NotNull)
+
+    def __repr__(self) -> str:
+        return "NOT NULL"
+
+
+NOT_NULL = NotNull()
+
+
+@dataclass(frozen=True)
+class ColCond:
+    """Filter of one column, ANDed with the filters of the other columns
+
+    values are matched with IN, null True adds the NULL rows to them and
+    null False keeps only the rows with a value. lo and hi are inclusive and
+    prefix matches the beginning of strings.
+    """
+
+    values: tuple[Any, ...] = ()
+    null: bool | None = None
+    lo: Any = None
+    hi: Any = None
+    prefix: str = ""
+
+    def __bool__(self) -> bool:
+        return bool(
+            self.values
+            or self.null is not None
+            or self.lo is not None
+            or self.hi is not None
+            or self.prefix
+        )
+
+    def __str__(self) -> str:
+        parts = [str(getattr(value, "value", value)) for value in self.values]
+        if self.null is True:
+            parts.append("NULL")
+        elif self.null is False:
+            parts.append("NOT NULL")
+        if self.lo is not None or self.hi is not None:
+            lo = "" if self.lo is None else self.lo
+            hi = "" if self.hi is None else self.hi
+            parts.append(f"{lo}..{hi}")
+        if self.prefix:
+            parts.append(f"{self.prefix}*")
+        return " | ".join(parts)
+
+
+def from_selected(selected: list) -> ColCond:
+    """Condition of the options chosen in a multi-value filter"""
+    values = tuple(v for v in selected if v is not None and v != NOT_NULL)
+    null = None
+    if None in selected:
+        null = True
+    elif NOT_NULL in selected:
+        null = False
+    return ColCond(values=values, null=null)
+
+
+def prefix_upper(prefix: str) -> str | None:
+    """Smallest string greater than every string starting with prefix"""
+    chars = prefix.rstrip(chr(sys.maxunicode))
+    if not chars:
+        return None
+    return chars[:-1] + chr(ord(chars[-1]) + 1)
+
+
+def cond_clauses(col: ColumnElement, cond: ColCond) -> list[ColumnElement]:
+    """WHERE clauses of cond that leave col bare, so an index on it can be used
+
+    A prefix becomes a range, that the LIKE after it only rechecks inside the
+    range, because LIKE 'x%' can't use an index on most collations. The range
+    makes it case sensitive even where LIKE is not, as on sqlite.
+    """
+    clauses: list[ColumnElement] = []
+    if cond.values:
+        if len(cond.values) == 1:
+            values_clause = col == cond.values[0]
+        else:
+            values_clause = col.in_(cond.values)
+        if cond.null is True:
+            values_clause = or_(values_clause, col.is_(None))
+        clauses.append(values_clause)
+    elif cond.null is True:
+        clauses.append(col.is_(None))
+
+    if cond.null is False:
+        clauses.append(col.is_not(None))
+    if cond.lo is not None:
+        clauses.append(col >= cond.lo)
+    if cond.hi is not None:
+        clauses.append(col <= cond.hi)
+
+    if cond.prefix:
+        clauses.append(col >= cond.prefix)
+        upper = prefix_upper(cond.prefix)
+        if upper is not None:
+            clauses.append(col < upper)
+        clauses.append(col.startswith(cond.prefix, autoescape=True))
+
+    return clauses
@@ -1,12 +1,16 @@
+from typing import Literal
+
 import streamlit as st
-from sqlalchemy import select
-from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy import delete, inspect, select
+from sqlalchemy.orm import ONETOMANY, DeclarativeBase, Session
 from streamlit import session_state as ss
 from streamlit.connections.sql_connection import SQLConnection
 
+from streamlit_sql.balance import get_store
+from streamlit_sql.cache import bump_tables
 from streamlit_sql.filters import ExistingData
 from streamlit_sql.input_fields import InputFields
-from streamlit_sql.lib import get_pretty_name, log, set_state
+from streamlit_sql.lib import get_pretty_name, in_chunks, log, set_state
 
 
 class CreateRow:
@@ -51,6 +55,7 @@ class CreateRow:
     def show(self, pretty_name: str):
         st.subheader(pretty_name)
 
+        self.input_fields.fk_search_inputs()
         with st.form(f"create_model_form_{pretty_name}_{self.base_key}", border=False):
             created = self.get_fields()
             create_btn = st.form_submit_button("Save", type="primary")
@@ -62,6 +67,8 @@ class CreateRow:
                     s.add(row)
                     s.commit()
                     ss.stsql_updated += 1
+                    bump_tables(self.Model.__tablename__)
+                    get_store().patch(s, self.Model.__tablename__, [row.id])
                     log("CREATE", self.Model.__tablename__, row)
                     return True, f"Criado com sucesso {row}"
                 except Exception as e:
@@ -90,6 +97,43 @@ class CreateRow:
         wrap_show_update()
 
 
+def needs_orm_delete(Model: type[DeclarativeBase]) -> bool:
+    """If deleting must go through the ORM: cascades, association rows or events"""
+    mapper = inspect(Model)
+    has_cascade = any(
+        rel.cascade.delete or rel.secondary is not None for rel in mapper.relationships
+    )
+    has_events = bool(mapper.dispatch.before_delete or mapper.dispatch.after_delete)
+    return has_cascade or has_events
+
+
+def orm_delete_tables(Model: type[DeclarativeBase]) -> set[str]:
+    """Tables an ORM delete of Model rows can change
+
+    Follows the delete cascades recursively, adding the association tables and
+    the one to many children whose foreign key is set to NULL.
+    """
+    tables: set[str] = set()
+    seen = set()
+    mappers = [inspect(Model)]
+    while mappers:
+        mapper = mappers.pop()
+        if mapper in seen:
+            continue
+        seen.add(mapper)
+        tables.update(table.name for table in mapper.tables)
+        for rel in mapper.relationships:
+            if rel.viewonly:
+                continue
+            if rel.secondary is not None:
+                tables.add(rel.secondary.name)
+            if rel.cascade.delete:
+                mappers.append(rel.mapper)
+            elif rel.direction is ONETOMANY:
+                tables.update(table.name for table in rel.mapper.tables)
+    return tables
+
+
 class DeleteRows:
     def __init__(
         self,
@@ -97,12 +141,17 @@ class DeleteRows:
         Model: type[DeclarativeBase],
         rows_id: list[int],
         base_key: str = "stsql_delete_rows",
+        mode: Literal["auto", "bulk", "orm"] = "auto",
     ) -> None:
         self.conn = conn
         self.Model = Model
         self.rows_id = rows_id
         self.base_key = base_key
 
+        if mode == "auto":
+            mode = "orm" if needs_orm_delete(Model) else "bulk"
+        self.mode = mode
+
     @st.cache_data
     def get_rows_str(_self, rows_id: list[int]):
         id_col = _self.Model.__table__.columns.get("id")
@@ -115,6 +164,36 @@ class DeleteRows:
 
         return rows_str
 
+    def delete_orm(self, s: Session):
+        lancs = []
+        for row_id in self.rows_id:
+            lanc = s.get(self.Model, row_id)
+            lancs.append(str(lanc))
+            s.delete(lanc)
+
+        return lancs
+
+    def delete_bulk(self, s: Session):
+        """DELETE ... WHERE id IN in chunks, under the backend parameters limit"""
+        id_col = self.Model.__table__.columns.get("id")
+        assert id_col is not None
+        dialect = s.get_bind().dialect
+
+        lancs = []
+        if not dialect.delete_returning:
+            lancs = self.get_rows_str(self.rows_id)
+
+        for chunk in in_chunks(self.rows_id, dialect.name):
+            stmt = delete(self.Model).where(id_col.in_(chunk))
+            stmt = stmt.execution_options(synchronize_session=False)
+            if dialect.delete_returning:
+                rows = s.scalars(stmt.returning(self.Model))
+                lancs.extend(str(row) for row in rows)
+            else:
+                s.execute(stmt)
+
+        return lancs
+
     def show(self, pretty_name):
         st.subheader("Apagar items abaixo?")
 
@@ -123,18 +202,23 @@ class DeleteRows:
 
         btn = st.button("Delete", key=self.base_key)
         if btn:
-            id_col = self.Model.__table__.columns.get("id")
-            assert id_col is not None
-            lancs = []
+            table_name = self.Model.__tablename__
+            store = get_store()
             with self.conn.session as s:
                 try:
-                    for row_id in self.rows_id:
-                        lanc = s.get(self.Model, row_id)
-                        lancs.append(str(lanc))
-                        s.delete(lanc)
+                    before = store.snapshot(s, table_name, self.rows_id)
+                    if self.mode == "orm":
+                        lancs = self.delete_orm(s)
+                    else:
+                        lancs = self.delete_bulk(s)
 
                     s.commit()
                     ss.stsql_updated += 1
+                    if self.mode == "orm":
+                        bump_tables(*orm_delete_tables(self.Model))
+                    else:
+                        bump_tables(table_name)
+                    store.patch(s, table_name, self.rows_id, before)
                     qtty = len(self.rows_id)
                     lancs_str = ", ".join(lancs)
                     log("DELETE", self.Model.__tablename__, lancs_str)
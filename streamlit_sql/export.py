@@ -0,0 +1,121 @@
+import tempfile
+from pathlib import Path
+from typing import Literal
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+from sqlalchemy import Select
+from sqlalchemy.engine import Engine
+
+from streamlit_sql import arrow
+
+EXPORT_BATCH = 5000
+
+ExportFormat = Literal["CSV", "Parquet", "Arrow IPC"]
+FORMATS: dict[str, tuple[str, str]] = {
+    "CSV": (".csv", "text/csv"),
+    "Parquet": (".parquet", "application/vnd.apache.parquet"),
+    "Arrow IPC": (".arrow", "application/vnd.apache.arrow.file"),
+}
+
+
+def open_writer(path: str, fmt: ExportFormat, schema: pa.Schema):
+    if fmt == "CSV":
+        return pa_csv.CSVWriter(path, schema)
+    if fmt == "Parquet":
+        return pq.ParquetWriter(path, schema)
+    return pa.ipc.new_file(path, schema)
+
+
+def batch_table(rows, colsname: list[str], col_types: list) -> pa.Table:
+    cols_values = list(zip(*rows, strict=True)) or [() for _ in colsname]
+    arrays = []
+    for values, col_type in zip(cols_values, col_types, strict=True):
+        arr = arrow.to_array(values, col_type)
+        # Dictionaries differ between batches, that a single file can't hold
+        if pa.types.is_dictionary(arr.type):
+            arr = arr.dictionary_decode()
+        arrays.append(arr)
+
+    return pa.Table.from_arrays(arrays, names=colsname)
+
+
+class Balance:
+    """Running sum of a column along the exported batches"""
+
+    def __init__(self, colname: str, balance_colname: str, initial: float) -> None:
+        self.colname = colname
+        self.balance_colname = balance_colname
+        self.total = initial
+
+    def add(self, table: pa.Table):
+        values = table[self.colname].cast(pa.float64()).fill_null(0)
+        balance = pc.add(pc.cumulative_sum(values), self.total)
+        if len(balance) > 0:
+            self.total = balance[-1].as_py()
+
+        return table.append_column(self.balance_colname, balance)
+
+
+def export_file(
+    engine: Engine,
+    stmt: Select,
+    fmt: ExportFormat,
+    balance: Balance | None = None,
+) -> str:
+    """Write the rows of stmt to a temporary file, one batch at a time
+
+    Rows come from a server side cursor where the driver supports it, so only
+    one batch is held in memory. Returns the file path, that the caller removes.
+    The file is removed here if writing fails.
+    """
+    suffix = FORMATS[fmt][0]
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as tmp:
+        path = tmp.name
+
+    try:
+        write_file(path, engine, stmt, fmt, balance)
+    except BaseException:
+        Path(path).unlink(missing_ok=True)
+        raise
+
+    return path
+
+
+def write_file(
+    path: str,
+    engine: Engine,
+    stmt: Select,
+    fmt: ExportFormat,
+    balance: Balance | None,
+):
+    col_types = [col.type for col in stmt.selected_columns]
+    writer = None
+    schema = None
+    with engine.connect() as c:
+        stream_stmt = arrow.raw_enums(stmt).execution_options(
+            stream_results=True, yield_per=EXPORT_BATCH
+        )
+        result = c.execute(stream_stmt)
+        colsname = list(result.keys())
+        try:
+            for rows in result.partitions():
+                table = batch_table(rows, colsname, col_types)
+                if balance:
+                    table = balance.add(table)
+                if writer is None:
+                    schema = table.schema
+                    writer = open_writer(path, fmt, schema)
+                writer.write_table(table.cast(schema))
+
+            if writer is None:
+                table = batch_table([], colsname, col_types)
+                if balance:
+                    table = balance.add(table)
+                writer = open_writer(path, fmt, table.schema)
+                writer.write_table(table)
+        finally:
+            if writer is not None:
+                writer.close()
@@ -1,15 +1,27 @@
-from collections.abc import Sequence
+from collections.abc import Iterable, Sequence
 from dataclasses import dataclass
 from datetime import date
+from enum import Enum
+from functools import cached_property
 from typing import Any
 
-import streamlit as st
 from dateutil.relativedelta import relativedelta
-from sqlalchemy import distinct, func, select
+from sqlalchemy import Select, String, cast, distinct, func, literal, select, union_all
 from sqlalchemy.orm import DeclarativeBase
 from sqlalchemy.orm.session import Session
 from sqlalchemy.sql.schema import ForeignKey
-from streamlit import session_state as ss
+
+from streamlit_sql.cache import (
+    fingerprint,
+    get_shared_cache,
+    get_table_versions,
+    shared_cache,
+)
+
+LABEL_ATTR = "__stsql_label__"
+SEARCH_ATTR = "__stsql_search__"
+FK_SEARCH_LIMIT = 50
+TEXT_LIMIT = 10000
 
 
 @dataclass
@@ -18,6 +30,91 @@ class FkOpt:
     name: str
 
 
+def opt_key(value):
+    """Lookup key of an option: the id of ForeignKey options, else the value"""
+    return value.idx if isinstance(value, FkOpt) else value
+
+
+class IndexedOpts(Sequence):
+    """Immutable options with a key to position dict, for O(1) lookups
+
+    Built once where options are loaded and cached, then shared by ColFilter
+    and InputFields. ForeignKey options are found by their id.
+    """
+
+    def __init__(self, values: Iterable[Any]) -> None:
+        self.values = tuple(values)
+        self.positions: dict[Any, int] = {}
+        for i, value in enumerate(self.values):
+            try:
+                self.positions.setdefault(opt_key(value), i)
+            except TypeError:
+                continue
+
+    def __getitem__(self, i):
+        return self.values[i]
+
+    def __len__(self):
+        return len(self.values)
+
+    def __iter__(self):
+        return iter(self.values)
+
+    def __contains__(self, value):
+        return self.index_of(opt_key(value)) is not None
+
+    def __repr__(self):
+        return f"IndexedOpts({list(self.values)!r})"
+
+    def index_of(self, key) -> int | None:
+        try:
+            return self.positions.get(key)
+        except TypeError:
+            return None
+
+    @cached_property
+    def name_positions(self) -> dict[str, int]:
+        """Position of enum members by name, built on the first lookup"""
+        positions: dict[str, int] = {}
+        for i, value in enumerate(self.values):
+            if isinstance(value, Enum):
+                positions.setdefault(value.name, i)
+        return positions
+
+    def index_of_name(self, name: str) -> int | None:
+        return self.name_positions.get(name)
+
+    def append(self, value) -> "IndexedOpts":
+        """New options with value at the end, if not present"""
+        if value in self:
+            return self
+        return IndexedOpts([*self.values, value])
+
+
+def model_table(_self: "ExistingData", **kwargs):
+    return {_self.Model.__tablename__}
+
+
+def get_label(model: type[DeclarativeBase]):
+    """SQL expression labelling rows of model in ForeignKey options
+
+    Set by the model __stsql_label__ attribute, as a column name, a column
+    expression or a callable returning one. None if not set, when options are
+    labelled by str(row) instead.
+    """
+    label = getattr(model, LABEL_ATTR, None)
+    if isinstance(label, str):
+        return model.__table__.columns[label]
+    if callable(label):
+        return label()
+    return label
+
+
+def is_searchable(model: type[DeclarativeBase]) -> bool:
+    """If ForeignKey options of model are searched by label instead of listed"""
+    return bool(getattr(model, SEARCH_ATTR, False)) and get_label(model) is not None
+
+
 class ExistingData:
     def __init__(
         self,
@@ -36,9 +133,11 @@ class ExistingData:
         self._models = [reg for reg in reg_values if hasattr(reg, "__tablename__")]
 
         table_name = Model.__tablename__
-        self.text = self.get_text(table_name, ss.stsql_updated)
-        self.dt = self.get_dt(table_name, ss.stsql_updated)
-        self.fk = self.get_fk(table_name, ss.stsql_updated)
+
+        self.text = self.get_text(table_name)
+        self.dt = self.get_dt(table_name)
+        self.fk_search = self.get_fk_search()
+        self.fk = self.get_fk()
 
     def add_default_where(self, stmt, model: type[DeclarativeBase]):
         cols = model.__table__.columns
@@ -54,41 +153,63 @@ class ExistingData:
 
         return stmt
 
-    def _get_str_opts(self, column) -> Sequence[str]:
-        col_name = column.name
-        stmt = select(distinct(column)).select_from(self.Model).limit(10000)
-        stmt = self.add_default_where(stmt, self.Model)
+    @shared_cache(tables=model_table)
+    def get_str_opts(
+        _self, table_name: str, default_values: dict
+    ) -> dict[str, IndexedOpts]:
+        """Distinct values of every text column in a single UNION ALL"""
+        cols = [col for col in _self.cols if col.type.python_type is str]
+        if len(cols) == 0:
+            return {}
+
+        branches = []
+        for i, col in enumerate(cols):
+            stmt = select(distinct(col)).select_from(_self.Model).limit(TEXT_LIMIT)
+            stmt = _self.add_default_where(stmt, _self.Model)
+            subq = stmt.subquery()
+            value = cast(subq.c[0], String).label("stsql_value")
+            branches.append(select(literal(i).label("stsql_tag"), value))
 
-        opts = list(self.session.execute(stmt).scalars().all())
-        row_value = None
-        if self.row:
-            row_value: str | None = getattr(self.row, col_name)
-        if row_value is not None and row_value not in opts:
-            opts.append(row_value)
+        values: dict[str, list[str]] = {col.name: [] for col in cols}
+        for tag, value in _self.session.execute(union_all(*branches)):
+            values[cols[tag].name].append(value)
 
+        opts = {col_name: IndexedOpts(v) for col_name, v in values.items()}
         return opts
 
-    @st.cache_data
-    def get_text(_self, table_name: str, updated: int) -> dict[str, Sequence[str]]:
-        opts = {
-            col.name: _self._get_str_opts(col)
-            for col in _self.cols
-            if col.type.python_type is str
-        }
+    def get_text(self, table_name: str) -> dict[str, IndexedOpts]:
+        opts = dict(self.get_str_opts(table_name, self.default_values))
+        if self.row is None:
+            return opts
+
+        # The row value may be filtered out by the default values
+        for col_name, values in opts.items():
+            row_value = getattr(self.row, col_name)
+            if row_value is not None:
+                opts[col_name] = values.append(row_value)
+
         return opts
 
-    def _get_dt_col(self, column):
-        min_default = date.today() - relativedelta(days=30)
-        min_dt: date = self.session.query(func.min(column)).scalar() or min_default
-        max_dt: date = self.session.query(func.max(column)).scalar() or date.today()
-        return min_dt, max_dt
+    @shared_cache(tables=model_table)
+    def get_dt_range(
+        _self, table_name: str
+    ) -> dict[str, tuple[date | None, date | None]]:
+        """Min and max of every date column in a single SELECT"""
+        cols = [col for col in _self.cols if col.type.python_type is date]
+        if len(cols) == 0:
+            return {}
 
-    @st.cache_data
-    def get_dt(_self, table_name: str, updated: int) -> dict[str, tuple[date, date]]:
+        aggs = [agg for col in cols for agg in (func.min(col), func.max(col))]
+        row = _self.session.execute(select(*aggs)).one()
+        return {col.name: (row[2 * i], row[2 * i + 1]) for i, col in enumerate(cols)}
+
+    def get_dt(self, table_name: str) -> dict[str, tuple[date, date]]:
+        # Defaults of empty columns are not cached, today changes at midnight
+        today = date.today()
+        min_default = today - relativedelta(days=30)
         opts = {
-            col.name: _self._get_dt_col(col)
-            for col in _self.cols
-            if col.type.python_type is date
+            colname: (min_dt or min_default, max_dt or today)
+            for colname, (min_dt, max_dt) in self.get_dt_range(table_name).items()
         }
         return opts
 
@@ -97,34 +218,170 @@ class ExistingData:
         fk_opt = FkOpt(idx, str(row))
         return fk_opt
 
-    def get_foreign_opts(self, col, foreign_key: ForeignKey):
+    def get_foreign_model(self, foreign_key: ForeignKey):
         foreign_table_name = foreign_key.column.table.name
         model = next(
             reg for reg in self._models if reg.__tablename__ == foreign_table_name
         )
-        fk_pk_name = foreign_key.column.description
-        stmt = select(model).distinct()
+        return model
 
+    def get_label_stmt(self, foreign_key: ForeignKey):
+        """Select of the referenced column and the label, if the model has one"""
+        model = self.get_foreign_model(foreign_key)
+        label = get_label(model)
+        if label is None:
+            return None
+
+        stmt = select(foreign_key.column, cast(label, String)).select_from(model)
+        stmt = self.add_default_where(stmt, model)
+        return stmt
+
+    def get_orm_stmt(self, foreign_key: ForeignKey):
+        model = self.get_foreign_model(foreign_key)
+        stmt = select(model)
         stmt = self.add_default_where(stmt, model)
+        return stmt
 
+    def get_orm_opts(self, foreign_key: ForeignKey, stmt: Select):
+        """Options from str(row), for models without a label"""
+        fk_pk_name = foreign_key.column.description
         rows = self.session.execute(stmt).scalars()
+        opts = IndexedOpts(self.get_foreign_opt(row, fk_pk_name) for row in rows)
+        return opts
+
+    def load_foreign_opts(self, foreign_keys: list[ForeignKey]):
+        """Options of each referenced table, shared by all referring models
 
-        opts = [self.get_foreign_opt(row, fk_pk_name) for row in rows]
+        Tables whose model has a label are read in a single UNION ALL of
+        (id, label) tuples. Results are cached by statement and table version.
+        """
+        cache = get_shared_cache()
+        versions = get_table_versions()
 
-        opt_row = None
-        if self.row is not None:
-            opt_row = self.get_foreign_opt(self.row, fk_pk_name)
-        if opt_row and opt_row not in opts:
-            opts.append(opt_row)
+        opts_by_table: dict[str, IndexedOpts] = {}
+        keys = {}
+        missing: dict[str, Select] = {}
+        for foreign_key in foreign_keys:
+            table_name = foreign_key.column.table.name
+            if table_name in keys:
+                continue
+
+            label_stmt = self.get_label_stmt(foreign_key)
+            if label_stmt is None:
+                stmt = self.get_orm_stmt(foreign_key)
+            else:
+                stmt = label_stmt
+            key = ("fk_opts", fingerprint(stmt), versions.get([table_name]))
+            keys[table_name] = key
+
+            found, opts = cache.get(key)
+            if found:
+                opts_by_table[table_name] = opts
+            elif label_stmt is None:
+                opts_by_table[table_name] = self.get_orm_opts(foreign_key, stmt)
+                cache.set(key, opts_by_table[table_name])
+            else:
+                missing[table_name] = label_stmt
+
+        if missing:
+            tables_name = list(missing)
+            stmts = [
+                stmt.add_columns(literal(i).label("stsql_fk_table"))
+                for i, stmt in enumerate(missing.values())
+            ]
+            rows = self.session.execute(union_all(*stmts)).all()
+
+            loaded: dict[str, list[FkOpt]] = {name: [] for name in tables_name}
+            for idx, name, table_pos in rows:
+                loaded[tables_name[table_pos]].append(FkOpt(idx, name))
+
+            for table_name, values in loaded.items():
+                opts = IndexedOpts(values)
+                cache.set(keys[table_name], opts)
+                opts_by_table[table_name] = opts
+
+        return opts_by_table
+
+    def cached_opts(self, table_name: str, stmt: Select) -> IndexedOpts:
+        versions = get_table_versions().get([table_name])
+        key = ("fk_opts", fingerprint(stmt), versions)
+        cache = get_shared_cache()
+        found, opts = cache.get(key)
+        if not found:
+            rows = self.session.execute(stmt).all()
+            opts = IndexedOpts(FkOpt(idx, name) for idx, name in rows)
+            cache.set(key, opts)
 
         return opts
 
-    @st.cache_data
-    def get_fk(_self, table_name: str, _updated: int):
-        fk_cols = [col for col in _self.cols if len(list(col.foreign_keys)) > 0]
-        opts = {
-            col.description: _self.get_foreign_opts(col, next(iter(col.foreign_keys)))
-            for col in fk_cols
-            if col.description
-        }
+    def search_fk(self, col_name: str, prefix: str) -> IndexedOpts:
+        """Options of a searchable ForeignKey column whose label starts with prefix"""
+        foreign_key = self.fk_search[col_name]
+        model = self.get_foreign_model(foreign_key)
+        label = get_label(model)
+        stmt = self.get_label_stmt(foreign_key)
+        assert stmt is not None
+
+        stmt = (
+            stmt.where(label.startswith(prefix, autoescape=True))
+            .order_by(label)
+            .limit(FK_SEARCH_LIMIT)
+        )
+        return self.cached_opts(foreign_key.column.table.name, stmt)
+
+    def get_fk_opt(self, col_name: str, value) -> FkOpt | None:
+        """Option of a searchable ForeignKey column by its id"""
+        foreign_key = self.fk_search[col_name]
+        stmt = self.get_label_stmt(foreign_key)
+        assert stmt is not None
+
+        stmt = stmt.where(foreign_key.column == value)
+        opts = self.cached_opts(foreign_key.column.table.name, stmt)
+        if not opts:
+            return FkOpt(value, str(value))
+        return opts[0]
+
+    def get_all_fk_opts(self, col_name: str) -> IndexedOpts:
+        """All options of a ForeignKey column, loading searchable ones too"""
+        if col_name in self.fk:
+            return self.fk[col_name]
+
+        foreign_key = self.fk_search[col_name]
+        opts_by_table = self.load_foreign_opts([foreign_key])
+        return opts_by_table[foreign_key.column.table.name]
+
+    def get_fk_search(self):
+        fk_search = {}
+        for col in self.cols:
+            if not col.description or len(col.foreign_keys) == 0:
+                continue
+
+            foreign_key = next(iter(col.foreign_keys))
+            if is_searchable(self.get_foreign_model(foreign_key)):
+                fk_search[col.description] = foreign_key
+
+        return fk_search
+
+    def get_fk(self):
+        fk_cols = [
+            col
+            for col in self.cols
+            if len(list(col.foreign_keys)) > 0 and col.description not in self.fk_search
+        ]
+        foreign_keys = [next(iter(col.foreign_keys)) for col in fk_cols]
+        opts_by_table = self.load_foreign_opts(foreign_keys)
+
+        opts = {}
+        for col, foreign_key in zip(fk_cols, foreign_keys, strict=True):
+            if not col.description:
+                continue
+
+            col_opts = opts_by_table[foreign_key.column.table.name]
+            value = getattr(self.row, col.description, None)
+            if value is not None and col_opts.index_of(value) is None:
+                # Current value filtered out by default values: keep it selectable
+                col_opts = col_opts.append(FkOpt(value, str(value)))
+
+            opts[col.description] = col_opts
+
         return opts
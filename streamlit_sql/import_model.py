@@ -0,0 +1,339 @@
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass
+from datetime import date
+from decimal import Decimal, InvalidOperation
+from typing import Any
+
+import pandas as pd
+import pyarrow.parquet as pq
+import streamlit as st
+from sqlalchemy import Numeric, insert
+from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.sql.elements import KeyedColumnElement
+from sqlalchemy.types import Enum as SQLEnum
+from streamlit import session_state as ss
+from streamlit.connections.sql_connection import SQLConnection
+from streamlit.runtime.uploaded_file_manager import UploadedFile
+
+from streamlit_sql.balance import get_store
+from streamlit_sql.cache import bump_tables
+from streamlit_sql.filters import ExistingData
+from streamlit_sql.lib import get_pretty_name, log, set_state
+
+IMPORT_BATCH = 1000
+TRUE_STRS = {"true", "t", "1", "yes", "y", "sim", "s"}
+FALSE_STRS = {"false", "f", "0", "no", "n", "nao", "não"}
+
+
+@dataclass
+class BatchReport:
+    batch: int
+    first_row: int
+    inserted: int
+    rejected: int
+    error: str
+
+
+def fk_index(existing_data: ExistingData, col_name: str) -> dict[str, int]:
+    """Foreign table string representation to id, built once per import"""
+    opts = existing_data.get_all_fk_opts(col_name)
+    index = {opt.name: opt.idx for opt in opts}
+    index.update({str(opt.idx): opt.idx for opt in opts})
+    return index
+
+
+def fk_conversion(index: dict[str, int]):
+    def convert(serie: pd.Series):
+        return serie.astype(str).str.strip().map(index)
+
+    return convert
+
+
+def str_conversion(serie: pd.Series):
+    return serie.map(str, na_action="ignore")
+
+
+def int_conversion(serie: pd.Series):
+    nums = pd.to_numeric(serie, errors="coerce")
+    nums = nums.where(nums == nums.round())
+    return nums.astype("Int64")
+
+
+def float_conversion(serie: pd.Series):
+    return pd.to_numeric(serie, errors="coerce")
+
+
+def numeric_conversion(scale: int | None):
+    quantum = Decimal(10) ** -scale if scale else None
+
+    def to_decimal(value):
+        try:
+            dec = Decimal(str(value).strip())
+        except InvalidOperation:
+            return None
+        if not dec.is_finite():
+            return None
+        if quantum:
+            dec = dec.quantize(quantum)
+        return dec
+
+    def convert(serie: pd.Series):
+        return serie.map(to_decimal, na_action="ignore")
+
+    return convert
+
+
+def date_conversion(serie: pd.Series):
+    return pd.to_datetime(serie, errors="coerce").dt.date
+
+
+def bool_conversion(serie: pd.Series):
+    def to_bool(value):
+        if isinstance(value, bool):
+            return value
+        value_str = str(value).strip().lower()
+        if value_str in TRUE_STRS:
+            return True
+        if value_str in FALSE_STRS:
+            return False
+        return None
+
+    return serie.map(to_bool, na_action="ignore")
+
+
+def enum_conversion(col_type: SQLEnum):
+    members: list[Any] = list(col_type.enum_class or col_type.enums)
+    index = {str(getattr(member, "value", member)): member for member in members}
+    index.update({getattr(member, "name", member): member for member in members})
+
+    def convert(serie: pd.Series):
+        return serie.astype(str).str.strip().map(index)
+
+    return convert
+
+
+class ImportRows:
+    """Insert rows from a CSV or Parquet file in batches
+
+    File columns are matched to the model columns by name or pretty name and
+    converted with the same type rules as the create form. ForeignKey columns
+    accept the string representation of the foreign row or its id.
+    """
+
+    def __init__(
+        self,
+        conn: SQLConnection,
+        Model: type[DeclarativeBase],
+        default_values: dict | None = None,
+        base_key: str = "stsql_import_rows",
+        batch_size: int = IMPORT_BATCH,
+    ) -> None:
+        self.conn = conn
+        self.Model = Model
+        self.default_values = default_values or {}
+        self.base_key = base_key
+        self.batch_size = batch_size
+
+        set_state("stsql_updated", 0)
+
+        with conn.session as s:
+            self.existing_data = ExistingData(s, Model, self.default_values)
+
+        self.cols = [
+            col
+            for col in Model.__table__.columns
+            if not col.primary_key and col.description not in self.default_values
+        ]
+
+    def get_conversion(
+        self, col: KeyedColumnElement
+    ) -> Callable[[pd.Series], pd.Series] | None:
+        col_name = col.description
+        assert col_name is not None
+
+        if len(col.foreign_keys) > 0:
+            return fk_conversion(fk_index(self.existing_data, col_name))
+        if isinstance(col.type, SQLEnum):
+            return enum_conversion(col.type)
+        if col.type.python_type is str:
+            return str_conversion
+        if col.type.python_type is int:
+            return int_conversion
+        if col.type.python_type is float:
+            return float_conversion
+        if isinstance(col.type, Numeric):
+            return numeric_conversion(col.type.scale)
+        if col.type.python_type is date:
+            return date_conversion
+        if col.type.python_type is bool:
+            return bool_conversion
+        return None
+
+    def get_mapping(self, file_cols: list[str]) -> dict[str, str]:
+        """Model column name of each file column, by name or pretty name"""
+        by_name = {}
+        for col in self.cols:
+            col_name = col.description
+            assert col_name is not None
+            by_name[col_name.lower()] = col_name
+            by_name[get_pretty_name(col_name).lower()] = col_name
+
+        mapping = {
+            file_col: by_name[file_col.strip().lower()]
+            for file_col in file_cols
+            if file_col.strip().lower() in by_name
+        }
+        return mapping
+
+    def read_chunks(self, file: UploadedFile) -> Iterator[pd.DataFrame]:
+        if file.name.lower().endswith(".parquet"):
+            parquet = pq.ParquetFile(file)
+            for batch in parquet.iter_batches(batch_size=self.batch_size):
+                yield batch.to_pandas()
+        else:
+            yield from pd.read_csv(file, dtype=str, chunksize=self.batch_size)
+
+    def total_rows(self, file: UploadedFile) -> int | None:
+        if file.name.lower().endswith(".parquet"):
+            rows = pq.ParquetFile(file).metadata.num_rows
+            file.seek(0)
+            return rows
+        return None
+
+    def convert(
+        self,
+        chunk: pd.DataFrame,
+        mapping: dict[str, str],
+        conversions: dict[str, Callable[[pd.Series], pd.Series] | None],
+    ):
+        """Records to insert and errors of rows with values that can't convert"""
+        converted = pd.DataFrame(index=chunk.index)
+        invalid = pd.Series(False, index=chunk.index)
+        errors: list[str] = []
+        for file_col, col_name in mapping.items():
+            serie = chunk[file_col]
+            conversion = conversions[col_name]
+            values = conversion(serie) if conversion else serie
+
+            bad = serie.notna() & pd.isna(values)
+            if bad.any():
+                first_bad = serie[bad].iloc[0]
+                errors.append(f"{col_name}: {bad.sum()} invalid, e.g. {first_bad}")
+                invalid |= bad
+            converted[col_name] = values
+
+        table_cols = self.Model.__table__.columns
+        for col_name, value in self.default_values.items():
+            if col_name in table_cols:
+                converted[col_name] = value
+
+        valid = converted[~invalid].astype(object)
+        valid = valid.where(valid.notna(), None)
+        records = valid.to_dict("records")
+        return records, int(invalid.sum()), "; ".join(errors)
+
+    def insert_batch(self, records: list[dict]):
+        table = self.Model.__table__
+        with self.conn.session as s:
+            s.execute(insert(table), records)
+            s.commit()
+
+    def run(self, file: UploadedFile) -> list[BatchReport]:
+        """Insert the file rows, ValueError if no file column maps to the model"""
+        table_name = self.Model.__tablename__
+        total = self.total_rows(file)
+        progress = st.progress(0.0, text="Importando...")
+        conversions = {
+            col.description: self.get_conversion(col)
+            for col in self.cols
+            if col.description
+        }
+
+        reports: list[BatchReport] = []
+        first_row = 0
+        mapping: dict[str, str] = {}
+        for i, chunk in enumerate(self.read_chunks(file)):
+            if i == 0:
+                mapping = self.get_mapping(list(chunk.columns))
+            if not mapping:
+                progress.empty()
+                file_cols = ", ".join(map(str, chunk.columns))
+                msg = f"No file column matches a column of {table_name}: {file_cols}"
+                raise ValueError(msg)
+
+            records, rejected, error = self.convert(chunk, mapping, conversions)
+            inserted = 0
+            if records:
+                try:
+                    self.insert_batch(records)
+                    inserted = len(records)
+                except Exception as e:
+                    rejected += len(records)
+                    db_error = str(getattr(e, "orig", e))
+                    error = "; ".join(msg for msg in (error, db_error) if msg)
+
+            reports.append(BatchReport(i + 1, first_row, inserted, rejected, error))
+            first_row += len(chunk)
+
+            if total:
+                pct = min(first_row / total, 1.0)
+            else:
+                pct = min(file.tell() / max(file.size, 1), 1.0)
+            progress.progress(pct, text=f"Importando... {first_row} linhas lidas")
+
+        progress.empty()
+        inserted_total = sum(report.inserted for report in reports)
+        if inserted_total:
+            bump_tables(table_name)
+            get_store().drop_table(table_name)
+
+        log("CREATE", table_name, f"Imported {inserted_total} rows from {file.name}")
+        return reports
+
+    def show(self, pretty_name: str):
+        st.subheader(f"Import {pretty_name}")
+        col_names = [col.description for col in self.cols if col.description]
+        st.caption(f"Columns: {', '.join(col_names)}")
+
+        file = st.file_uploader(
+            "CSV or Parquet file",
+            type=["csv", "parquet"],
+            key=f"{self.base_key}_file",
+        )
+        btn = st.button("Import", type="primary", disabled=file is None)
+        if not btn or file is None:
+            return None, None
+
+        try:
+            reports = self.run(file)
+        except ValueError as e:
+            return False, str(e)
+        ss.stsql_updated += 1
+
+        inserted = sum(report.inserted for report in reports)
+        rejected = sum(report.rejected for report in reports)
+        failed = [report for report in reports if report.error]
+        if failed:
+            st.dataframe(pd.DataFrame(failed), hide_index=True)
+
+        msg = f"Importados {inserted} registros, {rejected} rejeitados"
+        return rejected == 0, msg
+
+    def show_dialog(self):
+        pretty_name = get_pretty_name(self.Model.__tablename__)
+
+        @st.dialog(f"Import {pretty_name}", width="large")  # pyright: ignore
+        def wrap_show_import():
+            set_state("stsql_updated", 0)
+            status, msg = self.show(pretty_name)
+
+            ss.stsql_update_ok = status
+            ss.stsql_update_message = msg
+            ss.stsql_opened = True
+
+            if status is True:
+                st.rerun()
+            elif status is False:
+                st.warning(msg)
+
+        wrap_show_import()
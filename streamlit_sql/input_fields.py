@@ -1,3 +1,4 @@
+import weakref
 from datetime import date
 from decimal import Decimal
 
@@ -6,11 +7,24 @@ from sqlalchemy import Numeric
 from sqlalchemy.orm import DeclarativeBase
 from sqlalchemy.sql.elements import KeyedColumnElement
 from sqlalchemy.types import Enum as SQLEnum
+from streamlit import session_state as ss
 from streamlit_datalist import stDatalist
 
-from streamlit_sql.filters import ExistingData
+from streamlit_sql.filters import ExistingData, IndexedOpts
 from streamlit_sql.lib import get_pretty_name
 
+_enum_opts: weakref.WeakKeyDictionary[SQLEnum, IndexedOpts] = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def enum_opts(col_enum: SQLEnum) -> IndexedOpts:
+    opts = _enum_opts.get(col_enum)
+    if opts is None:
+        opts = IndexedOpts(col_enum.enums)
+        _enum_opts[col_enum] = opts
+    return opts
+
 
 class InputFields:
     def __init__(
@@ -25,14 +39,59 @@ class InputFields:
         self.default_values = default_values
         self.existing_data = existing_data
 
+    def fk_search_inputs(self, colsname: list[str] | None = None):
+        """Search boxes of searchable ForeignKey columns, drawn outside forms
+
+        Forms only rerun on submit, so the options matching the typed prefix
+        are loaded when the search box is changed, before the form is drawn.
+        """
+        for col_name in self.existing_data.fk_search:
+            if col_name in self.default_values:
+                continue
+            if colsname is not None and col_name not in colsname:
+                continue
+
+            pretty_name = get_pretty_name(col_name)
+            st.text_input(
+                f"Search {pretty_name}",
+                key=f"{self.key_prefix}_{col_name}_search",
+                placeholder="Beginning of the name",
+            )
+
+    def input_fk_search(self, col_name: str, value: int | None):
+        key = f"{self.key_prefix}_{col_name}"
+        prefix = ss.get(f"{key}_search")
+        opts = self.existing_data.search_fk(col_name, prefix) if prefix else []
+        opts = list(opts)
+
+        current = None
+        if value is not None:
+            current = self.existing_data.get_fk_opt(col_name, value)
+            if current not in opts:
+                opts = [current, *opts]
+
+        input_value = st.selectbox(
+            col_name,
+            options=opts,
+            format_func=lambda opt: opt.name,
+            index=opts.index(current) if current else None,
+            key=key,
+        )
+        if not input_value:
+            return None
+        return input_value.idx
+
     def input_fk(self, col_name: str, value: int | None):
+        if col_name in self.existing_data.fk_search:
+            return self.input_fk_search(col_name, value)
+
         key = f"{self.key_prefix}_{col_name}"
         opts = self.existing_data.fk[col_name]
 
-        index = next((i for i, opt in enumerate(opts) if opt.idx == value), None)
+        index = opts.index_of(value)
         input_value = st.selectbox(
             col_name,
-            options=opts,
+            options=opts.values,
             format_func=lambda opt: opt.name,
             index=index,
             key=key,
@@ -42,27 +101,23 @@ class InputFields:
         return input_value.idx
 
     def get_col_str_opts(self, col_name: str, value: str | None):
-        opts = list(self.existing_data.text[col_name])
+        opts = self.existing_data.text[col_name]
         if value is None:
             return None, opts
 
-        try:
-            val_index = opts.index(value)
-            return val_index, opts
-        except ValueError:
-            opts.append(value)
-            val_index = len(opts) - 1
-            return val_index, opts
+        opts = opts.append(value)
+        return opts.index_of(value), opts
 
     def input_enum(self, col_enum: SQLEnum, col_value=None):
         col_name = col_enum.name
         assert col_name is not None
-        opts = col_enum.enums
+        opts = enum_opts(col_enum)
         if col_value:
-            index = opts.index(col_value)
+            # Rows hold enum members, options are their names
+            index = opts.index_of(getattr(col_value, "name", col_value))
         else:
             index = None
-        input_value = st.selectbox(col_name, opts, index=index)
+        input_value = st.selectbox(col_name, opts.values, index=index)
         return input_value
 
     def input_str(self, col_name: str, value=None):
@@ -70,7 +125,7 @@ class InputFields:
         val_index, opts = self.get_col_str_opts(col_name, value)
         input_value = stDatalist(
             col_name,
-            list(opts),
+            list(opts.values),
             index=val_index,  # pyright: ignore
             key=key,
         )
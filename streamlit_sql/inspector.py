@@ -0,0 +1,155 @@
+import json
+import sys
+import weakref
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from time import perf_counter
+from typing import Any
+
+from sqlalchemy import Select, event
+from sqlalchemy.engine import Engine
+
+from streamlit_sql.lib import log_query
+from streamlit_sql.read_cte import Explain
+
+SLOW_QUERY_SECONDS = 0.5
+START_ATTR = "stsql_query_start"
+# Wrappers that never issue statements of their own
+SKIP_MODULES = ("streamlit_sql.cache", "streamlit_sql.inspector", "streamlit_sql.lib")
+
+
+@dataclass
+class QueryRecord:
+    component: str
+    path: str
+    sql: str
+    seconds: float
+    rows: int | None
+    plan: str | None = None
+    statement: Any = field(default=None, repr=False, compare=False)
+
+    @property
+    def slow(self) -> bool:
+        return self.seconds >= SLOW_QUERY_SECONDS
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "component": self.component,
+            "path": self.path,
+            "sql": self.sql,
+            "seconds": self.seconds,
+            "rows": self.rows,
+            "slow": self.slow,
+            "plan": self.plan,
+        }
+
+
+class QueryRecorder:
+    """Statements issued by the script thread during one rerun"""
+
+    def __init__(self) -> None:
+        self.records: list[QueryRecord] = []
+        self.active = True
+
+
+_recorder: ContextVar[QueryRecorder | None] = ContextVar("stsql_recorder", default=None)
+_engines: weakref.WeakSet[Engine] = weakref.WeakSet()
+
+
+def get_component() -> tuple[str, str]:
+    """Innermost streamlit_sql function in the stack, and the chain leading to it
+
+    Frames of sqlalchemy and of the cache wrappers are skipped.
+    """
+    names: list[str] = []
+    frame = sys._getframe(1)
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "")
+        if module.startswith("streamlit_sql.") and module not in SKIP_MODULES:
+            names.append(frame.f_code.co_qualname)
+        frame = frame.f_back
+
+    if not names:
+        return "?", "?"
+    return names[0], " > ".join(reversed(names))
+
+
+def get_recorder() -> QueryRecorder | None:
+    recorder = _recorder.get()
+    if recorder is None or not recorder.active:
+        return None
+    return recorder
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Kept in the context of the execution, dropped with it if the statement fails
+    if get_recorder() is not None and context is not None:
+        setattr(context, START_ATTR, perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    recorder = get_recorder()
+    start = getattr(context, START_ATTR, None)
+    if recorder is None or start is None:
+        return
+
+    seconds = perf_counter() - start
+    component, path = get_component()
+    compiled = getattr(context, "compiled", None)
+    record = QueryRecord(
+        component=component,
+        path=path,
+        sql=statement,
+        seconds=seconds,
+        # Drivers like sqlite don't report the rows of a SELECT
+        rows=cursor.rowcount if cursor.rowcount >= 0 else None,
+        statement=getattr(compiled, "statement", None),
+    )
+    recorder.records.append(record)
+
+
+def instrument_engine(engine: Engine):
+    if engine in _engines:
+        return
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+    _engines.add(engine)
+
+
+def start(engine: Engine) -> QueryRecorder:
+    """Record the statements of engine issued by this thread from now on
+
+    Replaces the recorder of a previous rerun that stopped before stop().
+    """
+    instrument_engine(engine)
+    recorder = QueryRecorder()
+    _recorder.set(recorder)
+    return recorder
+
+
+def explain(engine: Engine, statement: Select) -> str:
+    try:
+        with engine.connect() as c:
+            rows = c.execute(Explain(statement)).all()
+    except Exception as e:
+        return f"EXPLAIN failed: {getattr(e, 'orig', e)}"
+
+    if engine.dialect.name == "postgresql":
+        plan = rows[0][0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return json.dumps(plan, indent=2)
+    if engine.dialect.name == "sqlite":
+        return "\n".join(str(row[-1]) for row in rows)
+    return "\n".join(" | ".join(str(value) for value in row) for row in rows)
+
+
+def stop(recorder: QueryRecorder, engine: Engine, with_plan: bool = False):
+    """Stop recording, add the query plans and log each record"""
+    recorder.active = False
+    for record in recorder.records:
+        if with_plan and isinstance(record.statement, Select):
+            record.plan = explain(engine, record.statement)
+        log_query(record.as_dict())
+
+    return recorder.records
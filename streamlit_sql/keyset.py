@@ -0,0 +1,290 @@
+from enum import Enum
+from typing import Any
+
+import pandas as pd
+from sqlalchemy import CTE, Date, Select, Subquery, and_, case, false, or_, true
+from sqlalchemy.orm import Session
+from sqlalchemy.types import Enum as SQLEnum
+from streamlit import session_state as ss
+
+from streamlit_sql import arrow
+from streamlit_sql.cache import fingerprint, get_table_versions, statement_tables
+from streamlit_sql.lib import set_state
+
+MAX_BOOKMARKS = 500
+
+
+def get_keys(
+    cte: CTE | Subquery, orderby_colsname: list[str]
+) -> list[tuple[str, bool]]:
+    """Key columns as (colname, descending). Id is appended to ensure uniqueness"""
+    colsname = [colname for colname in orderby_colsname if colname in cte.columns]
+    if "id" in cte.columns and "id" not in colsname:
+        colsname.append("id")
+
+    keys = [(colname, False) for colname in colsname]
+    return keys
+
+
+def is_nullable(col) -> bool:
+    # Labeled expressions don't tell if they can be NULL
+    return getattr(col, "nullable", True)
+
+
+def key_orderby(
+    cte: CTE | Subquery, keys: list[tuple[str, bool]], reverse: bool = False
+):
+    """ORDER BY of keys, with NULL after every value as seek_cond expects
+
+    NULLS FIRST / LAST is not available on every backend, so nullable columns
+    are ordered by a CASE before them.
+    """
+    orderby = []
+    for colname, desc in keys:
+        col = cte.columns[colname]
+        descending = desc != reverse
+        if is_nullable(col):
+            nulls = case((col.is_(None), 1), else_=0)
+            orderby.append(nulls.desc() if descending else nulls.asc())
+        orderby.append(col.desc() if descending else col.asc())
+
+    return orderby
+
+
+def key_eq(col, value):
+    return col.is_(None) if value is None else col == value
+
+
+def key_cmp(col, value, greater: bool, inclusive: bool):
+    """col greater or lower than value, NULL being greater than every value"""
+    if value is None:
+        if greater:
+            return col.is_(None) if inclusive else false()
+        return true() if inclusive else col.is_not(None)
+
+    if not greater:
+        return col <= value if inclusive else col < value
+
+    cmp = col >= value if inclusive else col > value
+    if is_nullable(col):
+        cmp = or_(cmp, col.is_(None))
+    return cmp
+
+
+def sort_value(value):
+    # Enum columns are stored, and ordered, by the name of the members
+    return value.name if isinstance(value, Enum) else value
+
+
+def compare_keys(keys: list[tuple[str, bool]], a: tuple, b: tuple) -> int:
+    """-1, 0 or 1 as a is ordered before, with or after b, like key_orderby"""
+    for (_, desc), raw_a, raw_b in zip(keys, a, b, strict=True):
+        value_a, value_b = sort_value(raw_a), sort_value(raw_b)
+        if value_a == value_b:
+            continue
+        if value_a is None or value_b is None:
+            greater = value_a is None
+        else:
+            greater = value_a > value_b
+        return 1 if greater != desc else -1
+    return 0
+
+
+def seek_cond(
+    cte: CTE | Subquery,
+    keys: list[tuple[str, bool]],
+    values: tuple,
+    after: bool,
+    inclusive: bool,
+):
+    """Expanded row-value comparison: (a > x) OR (a = x AND b > y) ...
+
+    Row values like tuple_(a, b) > (x, y) are not available on every backend and
+    can't mix directions, so the comparison is expanded. NULL keys are ordered
+    after every value.
+    """
+    conds = []
+    for i, (colname, desc) in enumerate(keys):
+        col = cte.columns[colname]
+        prev_eq = [key_eq(cte.columns[keys[j][0]], values[j]) for j in range(i)]
+        is_last = i == len(keys) - 1
+
+        cmp = key_cmp(col, values[i], after != desc, is_last and inclusive)
+        conds.append(and_(*prev_eq, cmp))
+
+    return or_(*conds)
+
+
+class KeysetPagination:
+    """Seek pagination over the key columns with a bookmark cache in session state
+
+    A bookmark is the key of the first row of a page. Each fetch reads one extra
+    row to bookmark the next page, so next page is a plain seek. Other pages are
+    reached by a narrow key-only query from the nearest bookmark (or from the end
+    of the result when closer), instead of OFFSET over full rows from the start.
+    """
+
+    def __init__(
+        self,
+        cte: CTE | Subquery,
+        keys: list[tuple[str, bool]],
+        stmt_no_pag: Select,
+        qtty_rows: int | None,
+        limit: int,
+        base_key: str = "",
+        enum_labels: bool = False,
+    ) -> None:
+        """enum_labels: enum columns of the recorded pages hold the values
+        shown instead of the stored strings, as read with arrow_fetch"""
+        self.cte = cte
+        self.keys = keys
+        self.stmt_no_pag = stmt_no_pag
+        self.qtty_rows = qtty_rows
+        self.limit = limit
+
+        self.colsname = [colname for colname, _ in keys]
+        self.stored_by_label: dict[str, dict[Any, str]] = {}
+        for colname in self.colsname if enum_labels else []:
+            col_type = cte.columns[colname].type
+            if isinstance(col_type, SQLEnum):
+                labels = arrow.enum_labels(col_type)
+                self.stored_by_label[colname] = {v: k for k, v in labels.items()}
+        self.bookmarks = self.get_bookmarks(base_key)
+
+    def get_bookmarks(self, base_key: str) -> dict[int, tuple]:
+        set_state("stsql_keyset", {})
+        # Changes from any session, or polled from cache_version_table, move rows
+        versions = get_table_versions().get(statement_tables(self.stmt_no_pag))
+        signature = (
+            fingerprint(self.stmt_no_pag),
+            tuple(self.keys),
+            self.limit,
+            versions,
+        )
+
+        state = ss.stsql_keyset.get(base_key)
+        if state is None or state["signature"] != signature:
+            state = {"signature": signature, "bookmarks": {}}
+            ss.stsql_keyset[base_key] = state
+
+        return state["bookmarks"]
+
+    def add_bookmark(self, page: int, values: tuple):
+        self.bookmarks.pop(page, None)
+        self.bookmarks[page] = values
+        while len(self.bookmarks) > MAX_BOOKMARKS:
+            oldest = next(iter(self.bookmarks))
+            self.bookmarks.pop(oldest)
+
+    def stmt_keys(self):
+        key_cols = [self.stmt_no_pag.selected_columns[c] for c in self.colsname]
+        stmt = self.stmt_no_pag.with_only_columns(*key_cols)
+        return stmt
+
+    def anchor_candidates(self, page: int):
+        """Yield (rows to skip, stmt to read the bookmark of page)"""
+        stmt = self.stmt_keys()
+
+        lower = [p for p in self.bookmarks if p < page]
+        lower_page = max(lower, default=1)
+        lower_values = self.bookmarks.get(lower_page)
+        skip = (page - lower_page) * self.limit
+        lower_stmt = stmt.order_by(*key_orderby(self.cte, self.keys))
+        if lower_values is not None:
+            cond = seek_cond(self.cte, self.keys, lower_values, True, True)
+            lower_stmt = lower_stmt.where(cond)
+        yield skip, lower_stmt.offset(skip).limit(1)
+
+        reverse_orderby = key_orderby(self.cte, self.keys, reverse=True)
+        higher = [p for p in self.bookmarks if p > page]
+        if higher:
+            higher_page = min(higher)
+            cond = seek_cond(
+                self.cte, self.keys, self.bookmarks[higher_page], False, False
+            )
+            skip = (higher_page - page) * self.limit - 1
+            higher_stmt = stmt.where(cond).order_by(*reverse_orderby)
+            yield skip, higher_stmt.offset(skip).limit(1)
+
+        if self.qtty_rows is None:
+            return
+
+        last_page = max((self.qtty_rows - 1) // self.limit + 1, 1)
+        skip = self.qtty_rows - (page - 1) * self.limit - 1
+        if page <= last_page and skip >= 0:
+            end_stmt = stmt.order_by(*reverse_orderby)
+            yield skip, end_stmt.offset(skip).limit(1)
+
+    def seek_anchor(self, session: Session, page: int) -> tuple | None:
+        _skip, stmt = min(self.anchor_candidates(page), key=lambda cand: cand[0])
+        row = session.execute(stmt).first()
+        if row is None:
+            return None
+
+        values = tuple(row)
+        self.add_bookmark(page, values)
+        return values
+
+    def stmt_from(self, values: tuple | None):
+        orderby = key_orderby(self.cte, self.keys)
+        stmt = self.stmt_no_pag.order_by(*orderby).limit(self.limit + 1)
+        if values is None:
+            return stmt
+
+        cond = seek_cond(self.cte, self.keys, values, True, True)
+        stmt = stmt.where(cond)
+        return stmt
+
+    def get_stmt_pag(self, session: Session, page: int):
+        if page <= 1:
+            return self.stmt_from(None)
+
+        values = self.bookmarks.get(page)
+        if values is None:
+            values = self.seek_anchor(session, page)
+        if values is None:
+            return self.stmt_from(None).offset((page - 1) * self.limit)
+
+        return self.stmt_from(values)
+
+    def bookmarked_stmt(self, page: int):
+        """Statement of page if it needs no query to find where it starts"""
+        if page <= 1:
+            return self.stmt_from(None)
+        if page not in self.bookmarks:
+            return None
+        return self.stmt_from(self.bookmarks[page])
+
+    def row_values(self, df: pd.DataFrame, pos: int):
+        records: list[dict[str, Any]] = df[self.colsname].iloc[[pos]].to_dict("records")
+        values = tuple(
+            self.to_python(colname, records[0][colname]) for colname in self.colsname
+        )
+        return values
+
+    def to_python(self, colname: str, value):
+        # pandas holds NULL as NaN or NaT
+        if pd.isna(value):
+            return None
+        # Bookmarks are compared with the stored strings, not the values shown
+        stored_by_label = self.stored_by_label.get(colname)
+        if stored_by_label is not None:
+            return stored_by_label.get(value, value)
+        # Date columns may be converted to datetime64 for display
+        if isinstance(value, pd.Timestamp) and isinstance(
+            self.cte.columns[colname].type, Date
+        ):
+            return value.date()
+        return value
+
+    def record(self, df: pd.DataFrame, page: int):
+        """Bookmark this page and the next one from the fetched rows"""
+        if df.empty:
+            return df
+
+        self.add_bookmark(page, self.row_values(df, 0))
+        if len(df) > self.limit:
+            self.add_bookmark(page + 1, self.row_values(df, self.limit))
+            df = df.iloc[: self.limit]
+
+        return df
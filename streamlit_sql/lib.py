@@ -5,6 +5,9 @@ import streamlit as st
 from loguru import logger
 from streamlit import session_state as ss
 
+IN_CHUNK = 10000
+IN_CHUNK_BY_DIALECT = {"sqlite": 900, "mssql": 2000, "oracle": 1000}
+
 
 def log(
     action: Literal["CREATE", "UPDATE", "DELETE"],
@@ -19,6 +22,23 @@ def log(
         logger.error(message, action, table, str(row))
 
 
+def log_timings(stage: str, timings: dict[str, float]):
+    message = "| Timing={} | Item={} | Seconds={:.4f}"
+    for item, seconds in timings.items():
+        logger.debug(message, stage, item, seconds)
+
+
+def log_query(record: dict):
+    """Record of a statement, with its fields bound for structured sinks"""
+    message = "| Query={} | Component={} | Seconds={:.4f} | Rows={}"
+    args = (record["sql"], record["component"], record["seconds"], record["rows"])
+    bound = logger.bind(stsql_query=record)
+    if record["slow"]:
+        bound.warning(message, *args)
+    else:
+        bound.debug(message, *args)
+
+
 def set_logging(disable_log: bool):
     if disable_log:
         logger.disable("streamlit_sql")
@@ -34,6 +54,13 @@ def set_state(key: str, value):
         ss[key] = value
 
 
+def in_chunks(values: list[int], dialect_name: str):
+    """Split values of a WHERE ... IN under the backend bind parameters limit"""
+    size = IN_CHUNK_BY_DIALECT.get(dialect_name, IN_CHUNK)
+    for i in range(0, len(values), size):
+        yield values[i : i + size]
+
+
 @st.cache_data
 def get_pretty_name(name: str):
     pretty_name = " ".join(name.split("_")).title()
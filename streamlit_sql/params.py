@@ -1,10 +1,16 @@
 from datetime import date
 
 import streamlit as st
-from sqlalchemy.sql.elements import KeyedColumnElement
 from streamlit import session_state as ss
 
-from streamlit_sql.filters import FkOpt
+from streamlit_sql.columns import ColMeta
+from streamlit_sql.conditions import NOT_NULL
+from streamlit_sql.filters import FkOpt, IndexedOpts
+
+SORT_PARAM = "stsql_sort"
+NULL_PARAM = "~null"
+NOT_NULL_PARAM = "~notnull"
+BOOL_PARAMS = {"True": True, "False": False}
 
 
 def get_dt_param(colname: str):
@@ -23,28 +29,78 @@ def get_dt_param(colname: str):
     return inicio, final
 
 
-def get_no_dt_param(col: KeyedColumnElement, existing: list):
-    colname = col.description
-    if not colname:
-        return None
+def encode_value(value) -> str:
+    if value is None:
+        return NULL_PARAM
+    if value == NOT_NULL:
+        return NOT_NULL_PARAM
+    return str(getattr(value, "name", value))
 
-    param = st.query_params.get(colname, None)
-    if not param:
-        return None
 
-    if col.type.python_type is str:
-        return existing.index(param)
+def decode_index(meta: ColMeta, existing: IndexedOpts, param: str) -> int | None:
+    if param == NULL_PARAM:
+        value = None
+    elif meta.kind == "bool":
+        value = BOOL_PARAMS.get(param)
+    else:
+        value = param
+
+    index = existing.index_of(value)
+    if index is None and meta.kind == "enum":
+        # Enum members are encoded by name
+        index = existing.index_of_name(param)
+    return index
+
 
-    if col.type.python_type is not int:
-        return None
+def get_in_param(meta: ColMeta, existing: IndexedOpts) -> list:
+    """Options chosen in a multi-value filter, from repeated query params"""
+    selected = []
+    for param in st.query_params.get_all(meta.name):
+        if param == NOT_NULL_PARAM:
+            if None in existing:
+                selected.append(NOT_NULL)
+            continue
 
-    try:
-        idx = int(param)
-    except ValueError:
-        return None
+        index = decode_index(meta, existing, param)
+        if index is not None:
+            selected.append(existing[index])
 
-    index = next((i for i, fk in enumerate(existing) if fk.idx == idx), None)
-    return index
+    return selected
+
+
+def set_in_param(colname: str, key: str):
+    values = ss[key]
+    if values:
+        st.query_params[colname] = [encode_value(value) for value in values]
+    else:
+        st.query_params.pop(colname, None)
+
+
+def get_range_param(meta: ColMeta):
+    convert = int if meta.kind == "int" else float
+    result: list[int | float | None] = []
+    for suffix in ("min", "max"):
+        param = st.query_params.get(f"{meta.name}_{suffix}", None)
+        try:
+            value = convert(param) if param else None
+        except ValueError:
+            value = None
+        result.append(value)
+
+    lo, hi = result
+    return lo, hi
+
+
+def get_prefix_param(colname: str) -> str:
+    return st.query_params.get(f"{colname}_prefix", "")
+
+
+def set_param(query_key: str, key: str):
+    value = ss[key]
+    if value is None or value == "":
+        st.query_params.pop(query_key, None)
+    else:
+        st.query_params[query_key] = str(value)
 
 
 def set_dt_param(colname: str, key: str, suffix: str):
@@ -62,3 +118,31 @@ def set_no_dt_param(colname: str, key: str):
     elif isinstance(value, FkOpt):
         value_str = str(value.idx)
         st.query_params[colname] = value_str
+
+
+def get_sort_param(colsname: list[str]) -> tuple[str | None, bool]:
+    param = st.query_params.get(SORT_PARAM, None)
+    if not param:
+        return None, False
+
+    desc = param.startswith("-")
+    colname = param.removeprefix("-")
+    if colname not in colsname:
+        return None, False
+
+    return colname, desc
+
+
+def set_sort_param(col_key: str, desc_key: str):
+    colname = ss[col_key]
+    if not colname:
+        st.query_params.pop(SORT_PARAM, None)
+        return
+
+    prefix = "-" if ss[desc_key] else ""
+    st.query_params[SORT_PARAM] = f"{prefix}{colname}"
+
+
+def clear_sort_param(col_key: str):
+    st.query_params.pop(SORT_PARAM, None)
+    ss[col_key] = None
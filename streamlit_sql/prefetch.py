@@ -0,0 +1,113 @@
+import threading
+from collections import OrderedDict
+from collections.abc import Hashable
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import pandas as pd
+import streamlit as st
+from sqlalchemy import Select
+from sqlalchemy.engine import Engine
+from streamlit import session_state as ss
+
+from streamlit_sql import arrow
+from streamlit_sql.cache import fingerprint, get_table_versions, statement_tables
+from streamlit_sql.lib import set_state
+
+PREFETCH_WORKERS = 2
+PREFETCH_ENTRIES = 6
+
+
+@st.cache_resource
+def get_executor():
+    return ThreadPoolExecutor(max_workers=PREFETCH_WORKERS)
+
+
+def fetch_page(engine: Engine, stmt_pag: Select, arrow_fetch: bool):
+    with engine.connect() as c:
+        df = arrow.read_page(c, stmt_pag, arrow_fetch)
+    return df
+
+
+class PagePrefetcher:
+    """Small LRU of pages of one SqlUi, some being fetched in worker threads
+
+    Pages are keyed by the page statement and the versions of its tables, so
+    a page built the same way after navigating is served from memory.
+    """
+
+    def __init__(self) -> None:
+        self.pages: OrderedDict[Hashable, Future] = OrderedDict()
+        self.signature: Hashable = None
+        self.lock = threading.Lock()
+
+    def get_key(self, stmt_pag: Select):
+        versions = get_table_versions().get(statement_tables(stmt_pag))
+        return (fingerprint(stmt_pag), versions)
+
+    def reset(self, signature: Hashable):
+        """Cancel pending fetches if filters, order or page size changed"""
+        if signature == self.signature:
+            return
+
+        with self.lock:
+            for future in self.pages.values():
+                future.cancel()
+            self.pages.clear()
+            self.signature = signature
+
+    def get(self, stmt_pag: Select) -> pd.DataFrame | None:
+        key = self.get_key(stmt_pag)
+        with self.lock:
+            future = self.pages.get(key)
+            if future is None:
+                return None
+            self.pages.move_to_end(key)
+
+        # Not started yet: fetching now is as fast. Running: wait for it
+        if future.cancel():
+            self.drop(key)
+            return None
+        try:
+            df = future.result()
+        except Exception:
+            self.drop(key)
+            return None
+
+        return df.copy()
+
+    def put(self, stmt_pag: Select, df: pd.DataFrame):
+        future: Future = Future()
+        future.set_result(df.copy())
+        with self.lock:
+            self.pages[self.get_key(stmt_pag)] = future
+            self.evict()
+
+    def submit(self, engine: Engine, stmts: list[Select], arrow_fetch: bool):
+        executor = get_executor()
+        for stmt in stmts:
+            key = self.get_key(stmt)
+            with self.lock:
+                if key in self.pages:
+                    continue
+                self.pages[key] = executor.submit(fetch_page, engine, stmt, arrow_fetch)
+                self.evict()
+
+    def drop(self, key: Hashable):
+        with self.lock:
+            self.pages.pop(key, None)
+
+    def evict(self):
+        while len(self.pages) > PREFETCH_ENTRIES:
+            _, future = self.pages.popitem(last=False)
+            future.cancel()
+
+
+def get_prefetcher(base_key: str, signature: Hashable) -> PagePrefetcher:
+    set_state("stsql_prefetch", {})
+    prefetcher = ss.stsql_prefetch.get(base_key)
+    if prefetcher is None:
+        prefetcher = PagePrefetcher()
+        ss.stsql_prefetch[base_key] = prefetcher
+
+    prefetcher.reset(signature)
+    return prefetcher
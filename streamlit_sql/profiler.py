@@ -0,0 +1,96 @@
+import math
+import threading
+from collections import deque
+from collections.abc import Iterator
+from contextlib import contextmanager
+from time import perf_counter
+
+import streamlit as st
+
+ROLLING_SAMPLES = 1000
+PERCENTILES = (50, 95, 99)
+
+STAGES = (
+    "bootstrap",
+    "filter",
+    "count",
+    "pagination",
+    "balance",
+    "fetch",
+    "convert",
+    "style",
+    "render",
+    "export",
+    "crud",
+)
+
+
+class StageTimer:
+    """Seconds spent in each stage of one rerun
+
+    Stages can be nested, the time of the inner stage is not counted in the
+    outer one, so the timings add up to the time of the rerun.
+    """
+
+    def __init__(self) -> None:
+        self.timings: dict[str, float] = {}
+        self.children: list[float] = []
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        assert name in STAGES, name
+        self.children.append(0.0)
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            seconds = perf_counter() - start
+            own = seconds - self.children.pop()
+            self.timings[name] = self.timings.get(name, 0.0) + own
+            if self.children:
+                self.children[-1] += seconds
+
+
+def percentile(values: list[float], p: int) -> float:
+    """Nearest rank percentile of sorted values"""
+    rank = max(math.ceil(p / 100 * len(values)), 1)
+    return values[rank - 1]
+
+
+class StageStats:
+    """Last ROLLING_SAMPLES timings of each stage, from all sessions"""
+
+    def __init__(self, samples: int = ROLLING_SAMPLES) -> None:
+        self.samples = samples
+        self.timings: dict[str, deque[float]] = {}
+        self.lock = threading.Lock()
+
+    def add(self, timings: dict[str, float]):
+        with self.lock:
+            for name, seconds in timings.items():
+                stage_timings = self.timings.get(name)
+                if stage_timings is None:
+                    stage_timings = deque(maxlen=self.samples)
+                    self.timings[name] = stage_timings
+                stage_timings.append(seconds)
+
+    def percentiles(self) -> dict[str, dict[str, float]]:
+        """p50, p95 and p99 of each stage in STAGES order, with the samples count"""
+        with self.lock:
+            timings = {name: sorted(values) for name, values in self.timings.items()}
+
+        result = {}
+        for name in STAGES:
+            values = timings.get(name)
+            if not values:
+                continue
+            stage_result = {f"p{p}": percentile(values, p) for p in PERCENTILES}
+            stage_result["samples"] = len(values)
+            result[name] = stage_result
+        return result
+
+
+@st.cache_resource
+def get_stage_stats(key: str):
+    """Shared stats of the SqlUi identified by key"""
+    return StageStats()
@@ -1,68 +1,199 @@
+import json
+import threading
 from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import date
-from typing import Any
+from time import perf_counter
+from typing import Any, Literal
 
 import pandas as pd
 import streamlit as st
 import streamlit_antd_components as sac
-from sqlalchemy import CTE, Select, distinct, func, select
+from sqlalchemy import (
+    CTE,
+    Select,
+    Subquery,
+    cast,
+    distinct,
+    func,
+    literal,
+    null,
+    select,
+    union_all,
+)
+from sqlalchemy.engine import Dialect, Engine
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.orm import Session
-from sqlalchemy.sql.elements import KeyedColumnElement
-from sqlalchemy.types import Enum as SQLEnum
+from sqlalchemy.sql import visitors
+from sqlalchemy.sql.base import Executable
+from sqlalchemy.sql.elements import (
+    ClauseElement,
+    FunctionFilter,
+    KeyedColumnElement,
+    Over,
+    WithinGroup,
+)
+from sqlalchemy.sql.functions import FunctionElement
+from streamlit import session_state as ss
 from streamlit.connections.sql_connection import SQLConnection
 from streamlit.delta_generator import DeltaGenerator
 
-from streamlit_sql import params
-from streamlit_sql.lib import get_pretty_name
+from streamlit_sql import conditions, keyset, params
+from streamlit_sql.cache import (
+    fingerprint,
+    get_table_versions,
+    shared_cache,
+    statement_tables,
+)
+from streamlit_sql.columns import ColMeta, get_columns
+from streamlit_sql.conditions import NOT_NULL, ColCond
+from streamlit_sql.filters import IndexedOpts
+from streamlit_sql.lib import get_pretty_name, log_timings
+
+BALANCE_COLNAME = "stsql_balance"
+COUNT_COLNAME = "stsql_qtty_rows"
+EXISTING_LIMIT = 10000
+SEARCH_LIMIT = 50
+BACKGROUND_COUNT_WORKERS = 2
+BACKGROUND_COUNT_ENTRIES = 1000
+RANGE_KINDS = ("int", "numeric")
+AGGREGATES = {"count", "sum", "avg", "min", "max", "array_agg", "group_concat"}
 
 hash_funcs: dict[Any, Callable[[Any], Any]] = {
     pd.Series: lambda serie: serie.to_dict(),
-    CTE: lambda sel: (str(sel), sel.compile().params),
-    Select: lambda sel: (str(sel), sel.compile().params),
+    CTE: fingerprint,
+    Select: fingerprint,
+    Subquery: fingerprint,
     "streamlit_sql.read_cte.ColFilter": lambda cl: (cl.dt_filters, cl.no_dt_filters),
 }
 
 
-def get_existing_cond(col: KeyedColumnElement):
-    is_str = col.type.python_type is str
-    is_bool = col.type.python_type is bool
-    is_enum = isinstance(col.type, SQLEnum)
-    is_not_pk = not col.primary_key
+def get_stmt_distinct(col: KeyedColumnElement):
+    stmt = select(distinct(col)).order_by(col).limit(EXISTING_LIMIT)
+    return stmt
 
-    fks = list(col.foreign_keys)
-    has_fk = len(fks) > 0
-    int_not_fk_cond = col.type.python_type is int and not has_fk
 
-    cond = is_not_pk and (is_str or is_bool or int_not_fk_cond, is_enum)
-    return cond
+def discover_sequential(session: Session, cols: list[KeyedColumnElement]):
+    result: dict[str, Any] = {}
+    timings: dict[str, float] = {}
+    for col in cols:
+        start = perf_counter()
+        values = session.execute(get_stmt_distinct(col)).scalars().all()
+        colname = col.description
+        assert colname is not None
+        result[colname] = values
+        timings[colname] = perf_counter() - start
 
+    return result, timings
+
+
+def discover_union(session: Session, cols: list[KeyedColumnElement]):
+    """All columns in one round trip: UNION ALL of tagged distinct subqueries
+
+    Each branch fills its own slot and NULLs of the right type in the others, so
+    values keep their result processing (enums, dates). Timing is for the batch.
+    """
+    if len(cols) == 0:
+        return {}, {}
+
+    start = perf_counter()
+    branches = []
+    for i, col in enumerate(cols):
+        subq = get_stmt_distinct(col).subquery()
+        slots = [
+            (subq.c[0] if j == i else cast(null(), other.type)).label(f"stsql_{j}")
+            for j, other in enumerate(cols)
+        ]
+        branches.append(select(literal(i).label("stsql_tag"), *slots))
+
+    stmt = union_all(*branches)
+    stmt = stmt.order_by(*stmt.selected_columns)
+
+    colsname = [col.description or "" for col in cols]
+    result: dict[str, Any] = {colname: [] for colname in colsname}
+    for row in session.execute(stmt):
+        tag = row[0]
+        result[colsname[tag]].append(row[tag + 1])
+
+    timings = {"union": perf_counter() - start}
+    return result, timings
 
-@st.cache_data(hash_funcs=hash_funcs)
-def get_existing_values(
-    _session: Session,
-    cte: CTE,
-    updated: int,
-    available_col_filter: list[str] | None = None,
-):
-    if not available_col_filter:
-        available_col_filter = []
 
-    cols = list(cte.columns)
+def discover_threads(session: Session, cols: list[KeyedColumnElement]):
+    """One query per column, run concurrently on connections of the pool"""
+    engine = session.get_bind()
+    pool_size = getattr(engine.pool, "size", None)
+    max_workers = min(len(cols), pool_size()) if callable(pool_size) else 1
+    if max_workers <= 1:
+        return discover_sequential(session, cols)
 
-    if len(available_col_filter) > 0:
-        cols = [col for col in cte.columns if get_existing_cond(col)]
+    def fetch(col: KeyedColumnElement):
+        start = perf_counter()
+        with engine.connect() as c:
+            values = c.execute(get_stmt_distinct(col)).scalars().all()
+        return values, perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        fetched = list(executor.map(fetch, cols))
 
     result: dict[str, Any] = {}
-    for col in cols:
-        stmt = select(distinct(col)).order_by(col).limit(10000)
-        values = _session.execute(stmt).scalars().all()
+    timings: dict[str, float] = {}
+    for col, (values, seconds) in zip(cols, fetched, strict=True):
         colname = col.description
         assert colname is not None
         result[colname] = values
+        timings[colname] = seconds
+
+    return result, timings
+
+
+DISCOVERY_STRATEGIES = {
+    "sequential": discover_sequential,
+    "union": discover_union,
+    "threads": discover_threads,
+}
+
+
+def stmt_tables(**kwargs):
+    stmt = kwargs.get("cte")
+    if stmt is None:
+        stmt = kwargs["stmt_no_pag"]
+    return statement_tables(stmt)
+
 
+@shared_cache(tables=stmt_tables, hash_funcs=hash_funcs)
+def get_existing_values(
+    _session: Session,
+    cte: CTE,
+    available_col_filter: list[str] | None = None,
+    strategy: Literal["sequential", "union", "threads"] = "sequential",
+    search_cols: list[str] | None = None,
+):
+    search_cols = search_cols or []
+    cols = [
+        cte.columns[meta.name]
+        for meta in get_columns(cte).select(available_col_filter)
+        if meta.listed and meta.name not in search_cols
+    ]
+
+    discover = DISCOVERY_STRATEGIES[strategy]
+    values, timings = discover(_session, cols)
+    log_timings("existing_values", timings)
+    result = {colname: IndexedOpts(v) for colname, v in values.items()}
     return result
 
 
+@shared_cache(tables=stmt_tables, hash_funcs=hash_funcs)
+def search_values(_session: Session, cte: CTE, colname: str, prefix: str):
+    """Values starting with prefix, matched like the prefix filter does"""
+    col = cte.columns[colname]
+    clauses = conditions.cond_clauses(col, ColCond(prefix=prefix))
+    stmt = select(distinct(col)).where(*clauses).order_by(col).limit(SEARCH_LIMIT)
+    values = _session.execute(stmt).scalars().all()
+    return list(values)
+
+
 class ColFilter:
     def __init__(
         self,
@@ -71,12 +202,17 @@ class ColFilter:
         existing_values: dict[str, Any],
         available_col_filter: list[str] | None = None,
         base_key: str = "",
+        search_cols: list[str] | None = None,
+        search_fn: Callable[[str, str], list] | None = None,
     ) -> None:
         self.container = container
         self.cte = cte
         self.existing_values = existing_values
         self.available_col_filter = available_col_filter or []
         self.base_key = base_key
+        self.search_cols = search_cols or []
+        self.search_fn = search_fn
+        self.columns = get_columns(cte)
 
         self.dt_filters = self.get_dt_filters()
         self.no_dt_filters = self.get_no_dt_filters()
@@ -101,17 +237,15 @@ class ColFilter:
 
     def get_dt_filters(self):
         cols = [
-            col
-            for col in self.cte.columns
-            if col.description in self.available_col_filter
-            and col.type.python_type is date
+            meta
+            for meta in self.columns.select(self.available_col_filter)
+            if meta.kind == "date"
         ]
 
         result: dict[str, tuple[date | None, date | None]] = {}
-        for col in cols:
-            colname = col.description
-            assert colname is not None
-            label = get_pretty_name(colname)
+        for meta in cols:
+            colname = meta.name
+            label = meta.label
             self.container.write(label)
             inicio_c, final_c, btn_c = self.container.columns(
                 [0.475, 0.475, 0.05], vertical_alignment="bottom"
@@ -165,64 +299,197 @@ class ColFilter:
 
     def get_no_dt_filters(self):
         cols = [
-            col
-            for col in self.cte.columns
-            if col.description in self.available_col_filter
-            and col.type.python_type is not date
+            meta
+            for meta in self.columns.select(self.available_col_filter)
+            if meta.kind != "date"
         ]
 
         result: dict[str, Any] = {}
-        for col in cols:
-            colname = col.description
-            assert colname is not None
+        for meta in cols:
+            colname = meta.name
+
+            is_search = colname in self.search_cols and meta.kind == "str"
+            if is_search and self.search_fn is not None:
+                result[colname] = self.get_search_filter(colname)
+                continue
+
+            if meta.kind in RANGE_KINDS and not meta.primary_key:
+                result[colname] = self.get_range_filter(meta)
+                continue
 
             existing_value = self.existing_values.get(colname)
 
             if existing_value is None:
-                return result
+                continue
 
-            label = get_pretty_name(colname)
-            key = f"{self.base_key}_no_dt_filter_{label}"
-            index = params.get_no_dt_param(col, existing_value)
-            col1, col2 = self.container.columns(
-                [0.95, 0.05], vertical_alignment="bottom"
-            )
-            value = col1.selectbox(
-                label,
-                options=self.existing_values[colname],
-                index=index,
-                key=key,
-                args=(colname, key),
-                on_change=params.set_no_dt_param,
-            )
-            btn = col2.button(label="", icon=":material/cancel:", key=f"{key}_btn")
-            if btn:
-                st.query_params.pop(colname, None)
-                st.rerun()
-
-            result[colname] = value
+            result[colname] = self.get_in_filter(meta, existing_value)
 
         return result
 
+    def get_in_filter(self, meta: ColMeta, existing: IndexedOpts):
+        colname = meta.name
+        key = f"{self.base_key}_no_dt_filter_{meta.label}"
+        extra = (NOT_NULL,) if None in existing else ()
+
+        default = params.get_in_param(meta, existing)
+        col1, col2 = self.container.columns([0.95, 0.05], vertical_alignment="bottom")
+        selected = col1.multiselect(
+            meta.label,
+            options=(*existing, *extra),
+            default=default,
+            format_func=format_opt,
+            key=key,
+            args=(colname, key),
+            on_change=params.set_in_param,
+        )
+        btn = col2.button(label="", icon=":material/cancel:", key=f"{key}_btn")
+        if btn:
+            st.query_params.pop(colname, None)
+            st.rerun()
+
+        return conditions.from_selected(selected)
+
+    def get_range_filter(self, meta: ColMeta):
+        colname = meta.name
+        key = f"{self.base_key}_range_filter_{meta.label}"
+        self.container.write(meta.label)
+        min_c, max_c, btn_c = self.container.columns(
+            [0.475, 0.475, 0.05], vertical_alignment="bottom"
+        )
+
+        default_min, default_max = params.get_range_param(meta)
+        step = 1 if meta.kind == "int" else None
+
+        min_key = f"{key}_min"
+        lo = min_c.number_input(
+            "Min",
+            value=default_min,
+            step=step,
+            key=min_key,
+            args=(f"{colname}_min", min_key),
+            on_change=params.set_param,
+        )
+
+        max_key = f"{key}_max"
+        hi = max_c.number_input(
+            "Max",
+            value=default_max,
+            step=step,
+            key=max_key,
+            args=(f"{colname}_max", max_key),
+            on_change=params.set_param,
+        )
+
+        btn = btn_c.button("", icon=":material/cancel:", key=f"{key}_btn")
+        if btn:
+            st.query_params.pop(f"{colname}_min", None)
+            st.query_params.pop(f"{colname}_max", None)
+            st.rerun()
+
+        return ColCond(lo=lo, hi=hi)
+
+    def get_search_filter(self, colname: str):
+        """Value chosen among the ones starting with the typed prefix
+
+        Without a chosen value, the rows starting with the prefix are kept.
+        """
+        assert self.search_fn is not None
+        label = get_pretty_name(colname)
+        key = f"{self.base_key}_no_dt_filter_{label}"
+        search_c, select_c, btn_c = self.container.columns(
+            [0.3, 0.65, 0.05], vertical_alignment="bottom"
+        )
+
+        search_key = f"{key}_search"
+        prefix = search_c.text_input(
+            f"Search {label}",
+            value=params.get_prefix_param(colname),
+            key=search_key,
+            args=(f"{colname}_prefix", search_key),
+            on_change=params.set_param,
+        )
+        opts = self.search_fn(colname, prefix) if prefix else []
+        current = st.query_params.get(colname)
+        if current and current not in opts:
+            opts = [current, *opts]
+
+        value = select_c.selectbox(
+            label,
+            options=opts,
+            index=opts.index(current) if current else None,
+            key=key,
+            args=(colname, key),
+            on_change=params.set_no_dt_param,
+        )
+        btn = btn_c.button(label="", icon=":material/cancel:", key=f"{key}_btn")
+        if btn:
+            st.query_params.pop(colname, None)
+            st.query_params.pop(f"{colname}_prefix", None)
+            st.rerun()
 
-def get_stmt_no_pag_dt(cte: CTE, no_dt_filters: dict[str, str | None]):
-    stmt = select(cte)
-    for colname, value in no_dt_filters.items():
         if value:
+            return ColCond(values=(value,))
+        return ColCond(prefix=prefix)
+
+
+def format_opt(value):
+    if value is None:
+        return "NULL"
+    return str(getattr(value, "value", value))
+
+
+def get_sort(container: DeltaGenerator, cte: CTE, base_key: str = ""):
+    """Column and descending flag chosen to order the rows, or None for default"""
+    colsname = [col.description for col in cte.columns if col.description]
+    default_col, default_desc = params.get_sort_param(colsname)
+
+    col_key = f"{base_key}_sort_col"
+    desc_key = f"{base_key}_sort_desc"
+    col1, col2, col3 = container.columns([0.75, 0.2, 0.05], vertical_alignment="bottom")
+    colname = col1.selectbox(
+        "Order by",
+        options=colsname,
+        index=colsname.index(default_col) if default_col else None,
+        format_func=get_pretty_name,
+        placeholder="Default order",
+        key=col_key,
+        args=(col_key, desc_key),
+        on_change=params.set_sort_param,
+    )
+    desc = col2.toggle(
+        "Descending",
+        value=default_desc,
+        key=desc_key,
+        args=(col_key, desc_key),
+        on_change=params.set_sort_param,
+    )
+    col3.button(
+        "",
+        icon=":material/cancel:",
+        key=f"{col_key}_btn",
+        args=(col_key,),
+        on_click=params.clear_sort_param,
+    )
+
+    if colname is None:
+        return None
+    return colname, desc
+
+
+def get_stmt_no_pag_dt(cte: CTE | Subquery, no_dt_filters: dict[str, ColCond]):
+    stmt = select(cte)
+    for colname, cond in no_dt_filters.items():
+        if cond:
             col = cte.columns.get(colname)
             assert col is not None
-            stmt = stmt.where(col == value)
+            stmt = stmt.where(*conditions.cond_clauses(col, cond))
 
     return stmt
 
 
-def get_stmt_no_pag(cte: CTE, col_filter: ColFilter):
-    no_dt_filters = col_filter.no_dt_filters
-    stmt = get_stmt_no_pag_dt(cte, no_dt_filters)
-
-    dt_filters = col_filter.dt_filters
+def add_dt_filters(stmt: Select, from_: CTE | Subquery, dt_filters: dict):
     for colname, filters in dt_filters.items():
-        col = cte.columns.get(colname)
+        col = from_.columns.get(colname)
         assert col is not None
         inicio, final = filters
         if inicio:
@@ -233,7 +500,157 @@ def get_stmt_no_pag(cte: CTE, col_filter: ColFilter):
     return stmt
 
 
-@st.cache_data(hash_funcs=hash_funcs)
+@dataclass
+class ReadSource:
+    """FROM of the read statements and the filters left to apply on it"""
+
+    from_: CTE | Subquery
+    no_dt_filters: dict[str, ColCond]
+    dt_filters: dict[str, tuple[date | None, date | None]]
+
+
+def get_stmt_no_pag(source: ReadSource):
+    stmt = get_stmt_no_pag_dt(source.from_, source.no_dt_filters)
+    stmt = add_dt_filters(stmt, source.from_, source.dt_filters)
+    return stmt
+
+
+def can_push_filters(stmt: Select) -> bool:
+    """Filters in the WHERE of stmt keep the same rows as filters around it
+
+    Not the case with GROUP BY, DISTINCT, LIMIT or aggregate and window
+    functions, whose results the filters would change.
+    """
+    if stmt._group_by_clauses or stmt._having_criteria or stmt._distinct:
+        return False
+    limits = (stmt._limit_clause, stmt._offset_clause, stmt._fetch_clause)
+    if any(clause is not None for clause in limits):
+        return False
+
+    for col in stmt.selected_columns:
+        for elem in visitors.iterate(col):
+            if isinstance(elem, Over | WithinGroup | FunctionFilter):
+                return False
+            if isinstance(elem, FunctionElement) and elem.name in AGGREGATES:
+                return False
+
+    return True
+
+
+def push_filters(stmt: Select, no_dt_filters: dict, dt_filters: dict):
+    """stmt with the filters in its WHERE, and the filters it has no column for"""
+    cols = stmt.selected_columns
+    left_no_dt: dict[str, ColCond] = {}
+    for colname, cond in no_dt_filters.items():
+        if colname not in cols:
+            left_no_dt[colname] = cond
+        elif cond:
+            stmt = stmt.where(*conditions.cond_clauses(cols[colname], cond))
+
+    left_dt: dict[str, tuple[date | None, date | None]] = {}
+    for colname, (inicio, final) in dt_filters.items():
+        if colname not in cols:
+            left_dt[colname] = inicio, final
+            continue
+        cond = ColCond(lo=inicio, hi=final)
+        stmt = stmt.where(*conditions.cond_clauses(cols[colname], cond))
+
+    return stmt, left_no_dt, left_dt
+
+
+def dt_conds(dt_filters: dict[str, tuple[date | None, date | None]]):
+    return {
+        colname: ColCond(lo=inicio or None, hi=final or None)
+        for colname, (inicio, final) in dt_filters.items()
+    }
+
+
+def get_read_source(
+    cte: CTE,
+    col_filter: ColFilter,
+    base_stmt: Select | None = None,
+    keep_dt_filters: bool = False,
+) -> ReadSource:
+    """Where the rows are read from, with the filters pushed into base_stmt
+
+    base_stmt is the Select of the CTE, that the filters reach the base tables
+    through even on engines that materialize CTEs. keep_dt_filters leaves the
+    date filters outside, for a balance that sums the rows before them.
+    Otherwise they are applied with the other filters.
+    """
+    if base_stmt is None:
+        if keep_dt_filters:
+            return ReadSource(cte, col_filter.no_dt_filters, col_filter.dt_filters)
+        no_dt_filters = {
+            **col_filter.no_dt_filters,
+            **dt_conds(col_filter.dt_filters),
+        }
+        return ReadSource(cte, no_dt_filters, {})
+
+    pushed_dt = {} if keep_dt_filters else col_filter.dt_filters
+    stmt, left_no_dt, left_dt = push_filters(
+        base_stmt, col_filter.no_dt_filters, pushed_dt
+    )
+    if keep_dt_filters:
+        left_dt = col_filter.dt_filters
+    else:
+        left_no_dt = {**left_no_dt, **dt_conds(left_dt)}
+        left_dt = {}
+
+    # A subquery, unlike a CTE, is merged into the outer query by the planners
+    return ReadSource(stmt.subquery(), left_no_dt, left_dt)
+
+
+def has_window_functions(dialect: Dialect) -> bool:
+    version = dialect.server_version_info or ()
+    if dialect.name == "sqlite":
+        return version >= (3, 25)
+    if dialect.name in ("mysql", "mariadb"):
+        min_version = (10, 2) if getattr(dialect, "is_mariadb", False) else (8, 0)
+        return version >= min_version
+
+    return dialect.name in ("postgresql", "mssql", "oracle")
+
+
+def get_stmt_no_pag_window(
+    source: ReadSource,
+    rolling_total_column: str | None,
+    keys: list[tuple[str, bool]],
+):
+    """Filtered rows with the total quantity and the running balance as columns
+
+    The balance is summed before the date filters, like initial_balance, so
+    the first row carries the balance of every earlier row. Keys must be unique
+    because the window frame is by rows.
+    """
+    cte = source.from_
+    stmt = get_stmt_no_pag_dt(cte, source.no_dt_filters)
+    if rolling_total_column:
+        rolling_col = cte.columns[rolling_total_column]
+        orderby = keyset.key_orderby(cte, keys)
+        balance = func.sum(rolling_col).over(order_by=orderby, rows=(None, 0))
+        stmt = stmt.add_columns(balance.label(BALANCE_COLNAME))
+
+    balance_subq = stmt.subquery()
+    stmt = select(balance_subq, func.count().over().label(COUNT_COLNAME))
+    stmt = add_dt_filters(stmt, balance_subq, source.dt_filters)
+
+    subq = stmt.subquery()
+    return subq
+
+
+def window_opening_balance(balance: pd.Series, rolling: pd.Series) -> float:
+    """Balance before the first row of a page of get_stmt_no_pag_window
+
+    The first balance includes the first row. NULL counts as 0, like in SUM.
+    """
+    first_balance, first_value = balance.iloc[0], rolling.iloc[0]
+    first_balance = 0 if pd.isna(first_balance) else first_balance
+    first_value = 0 if pd.isna(first_value) else first_value
+    return float(first_balance) - float(first_value)
+
+
+@shared_cache(tables=stmt_tables, hash_funcs=hash_funcs)
 def get_qtty_rows(_conn: SQLConnection, stmt_no_pag: Select):
     stmt = select(func.count()).select_from(stmt_no_pag.subquery())
     with _conn.session as s:
@@ -242,8 +659,129 @@ def get_qtty_rows(_conn: SQLConnection, stmt_no_pag: Select):
     return qtty
 
 
-def show_pagination(count: int, opts_items_page: tuple[int, ...], base_key: str = ""):
+@dataclass
+class QttyRows:
+    value: int
+    kind: Literal["exact", "capped", "estimated"] = "exact"
+
+
+class Explain(Executable, ClauseElement):
+    inherit_cache = False
+
+    def __init__(self, statement: Select, analyze: bool = False) -> None:
+        self.statement = statement
+        self.analyze = analyze
+
+
+@compiles(Explain)
+def compile_explain(element: Explain, compiler, **kw):
+    prefix = "EXPLAIN ANALYZE" if element.analyze else "EXPLAIN"
+    return f"{prefix} {compiler.process(element.statement, **kw)}"
+
+
+@compiles(Explain, "postgresql")
+def compile_explain_pg(element: Explain, compiler, **kw):
+    analyze = "ANALYZE, " if element.analyze else ""
+    statement = compiler.process(element.statement, **kw)
+    return f"EXPLAIN ({analyze}FORMAT JSON) {statement}"
+
+
+@compiles(Explain, "sqlite")
+def compile_explain_sqlite(element: Explain, compiler, **kw):
+    return f"EXPLAIN QUERY PLAN {compiler.process(element.statement, **kw)}"
+
+
+@shared_cache(tables=stmt_tables, hash_funcs=hash_funcs)
+def get_capped_qtty_rows(_conn: SQLConnection, stmt_no_pag: Select, cap: int):
+    """Count stops at cap + 1 rows"""
+    stmt = select(func.count()).select_from(stmt_no_pag.limit(cap + 1).subquery())
+    with _conn.session as s:
+        qtty = s.execute(stmt).scalar_one()
+
+    return qtty
+
+
+@shared_cache(tables=stmt_tables, hash_funcs=hash_funcs)
+def estimate_qtty_rows(_conn: SQLConnection, stmt_no_pag: Select) -> int | None:
+    """Planner row estimate. Only PostgreSQL is supported, None otherwise"""
+    if _conn.engine.dialect.name != "postgresql":
+        return None
+
+    with _conn.session as s:
+        plan = s.execute(Explain(stmt_no_pag)).scalar_one()
+
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+class BackgroundCounts:
+    """Exact counts computed in worker threads, shared by all sessions
+
+    Keyed by the versions of the tables read, so a change restarts the count.
+    """
+
+    def __init__(self) -> None:
+        self.executor = ThreadPoolExecutor(max_workers=BACKGROUND_COUNT_WORKERS)
+        self.futures: dict[Any, Future] = {}
+        self.lock = threading.Lock()
+
+    def get_key(self, stmt_no_pag: Select):
+        versions = get_table_versions().get(statement_tables(stmt_no_pag))
+        return (fingerprint(stmt_no_pag), versions)
+
+    def get(self, engine: Engine, stmt_no_pag: Select) -> int | None:
+        """Exact count if finished. If not started yet, start it"""
+        key = self.get_key(stmt_no_pag)
+        with self.lock:
+            future = self.futures.get(key)
+            if future is None:
+                stmt = select(func.count()).select_from(stmt_no_pag.subquery())
+                self.futures[key] = self.executor.submit(count_rows, engine, stmt)
+                while len(self.futures) > BACKGROUND_COUNT_ENTRIES:
+                    self.futures.pop(next(iter(self.futures)))
+                return None
+
+        # A failed count is kept, so it is not retried on every rerun
+        if not future.done() or future.exception() is not None:
+            return None
+
+        return future.result()
+
+    def is_done(self, stmt_no_pag: Select):
+        future = self.futures.get(self.get_key(stmt_no_pag))
+        if future is None or not future.done():
+            return False
+        return future.exception() is None
+
+
+def count_rows(engine: Engine, stmt: Select) -> int:
+    with engine.connect() as c:
+        qtty = c.execute(stmt).scalar_one()
+    return qtty
+
+
+@st.cache_resource
+def get_background_counts():
+    return BackgroundCounts()
+
+
+def get_pagination_state(opts_items_page: tuple[int, ...], base_key: str = ""):
+    """Items per page and page from show_pagination widgets, before drawing them"""
+    menu_cas = ss.get(f"{base_key}_menu_cascader")
+    items_per_page = menu_cas[0] if menu_cas else opts_items_page[0]
+    page = ss.get(f"{base_key}_pagination") or 1
+    return int(items_per_page), int(page)
+
+
+def show_pagination(
+    count: int,
+    opts_items_page: tuple[int, ...],
+    base_key: str = "",
+    count_kind: Literal["exact", "capped", "estimated"] = "exact",
+):
     pag_col1, pag_col2 = st.columns([0.2, 0.8])
+    is_exact = count_kind == "exact"
 
     first_item_candidates = [item for item in opts_items_page if item > count]
     last_item = (
@@ -260,11 +798,19 @@ def show_pagination(count: int, opts_items_page: tuple[int, ...], base_key: str
 
     items_per_page = menu_cas[0] if menu_cas else items_page_str[0]
 
+    total = count
+    if not is_exact:
+        # Keep the page after the current one reachable while the total is unknown
+        current_page = ss.get(f"{base_key}_pagination") or 1
+        total = max(count, (int(current_page) + 1) * int(items_per_page))
+        count_str = f"~{count:,}" if count_kind == "estimated" else f"{count:,}+"
+        pag_col1.caption(f"Total: {count_str} items")
+
     with pag_col2:
         page = sac.pagination(
-            total=count,
+            total=total,
             page_size=int(items_per_page),
-            show_total=True,
+            show_total=is_exact,
             jump=True,
             key=f"{base_key}_pagination",
         )
@@ -278,25 +824,37 @@ def get_stmt_pag(stmt_no_pag: Select, limit: int, page: int):
     return stmt
 
 
+def get_first_values(
+    session: Session,
+    from_: CTE | Subquery,
+    keys: list[tuple[str, bool]],
+    stmt_pag: Select,
+):
+    orderby = keyset.key_orderby(from_, keys)
+    stmt_pag_ordered = stmt_pag.order_by(None).order_by(*orderby)
+    first_pag = session.execute(stmt_pag_ordered).first()
+    if not first_pag:
+        return None
+
+    values = tuple(getattr(first_pag, colname) for colname, _ in keys)
+    return values
+
+
 # @st.cache_data(hash_funcs=hash_funcs)
 def initial_balance(
     _session: Session,
+    from_: CTE | Subquery,
+    keys: list[tuple[str, bool]],
     stmt_no_pag_dt: Select,
     stmt_pag: Select,
     rolling_total_column: str,
-    orderby_cols: list,
 ) -> float:
-    stmt_pag_ordered = stmt_pag.order_by(*orderby_cols)
-    first_pag = _session.execute(stmt_pag_ordered).first()
-    if not first_pag:
+    first_values = get_first_values(_session, from_, keys, stmt_pag)
+    if first_values is None:
         return 0
 
-    stmt_no_pag_dt_ordered = stmt_no_pag_dt.order_by(*orderby_cols)
-    for col in orderby_cols:
-        stmt_no_pag_dt_ordered = stmt_no_pag_dt_ordered.where(
-            col < getattr(first_pag, col.name)
-        )
-
-    stmt_bal = select(func.sum(stmt_no_pag_dt_ordered.c.get(rolling_total_column)))
+    rolling_col = from_.columns[rolling_total_column]
+    stmt_bal = stmt_no_pag_dt.with_only_columns(func.sum(rolling_col))
+    stmt_bal = stmt_bal.where(keyset.seek_cond(from_, keys, first_values, False, False))
     bal = _session.execute(stmt_bal).scalar_one() or 0
-    return bal
+    return float(bal)
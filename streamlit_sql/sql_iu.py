@@ -1,17 +1,35 @@
 from collections.abc import Callable
+from functools import partial
+from pathlib import Path
+from typing import Literal
 
 import pandas as pd
 import streamlit as st
-from sqlalchemy import CTE, Select, select
+from sqlalchemy import CTE, Select, Subquery, select
 from sqlalchemy.orm import DeclarativeBase
-from sqlalchemy.types import Enum as SQLEnum
 from streamlit import session_state as ss
 from streamlit.connections import SQLConnection
 from streamlit.elements.arrow import DataframeState
 
-from streamlit_sql import create_delete_model, lib, read_cte, update_model
+from streamlit_sql import (
+    arrow,
+    balance,
+    cache,
+    columns,
+    create_delete_model,
+    export,
+    import_model,
+    inspector,
+    keyset,
+    lib,
+    prefetch,
+    profiler,
+    read_cte,
+    update_model,
+)
 
 OPTS_ITEMS_PAGE = (50, 100, 200, 500, 1000)
+COUNT_POLL_SECONDS = 2
 
 
 class SqlUi:
@@ -40,6 +58,23 @@ class SqlUi:
         style_fn: Callable[[pd.Series], list[str]] | None = None,
         update_show_many: bool = False,
         disable_log: bool = False,
+        keyset_pagination: bool = False,
+        single_query: bool = False,
+        balance_checkpoint_rows: int | None = None,
+        filter_discovery: Literal["sequential", "union", "threads"] = "sequential",
+        filter_search_cols: list[str] | None = None,
+        count_strategy: Literal["exact", "capped", "estimated"] = "exact",
+        count_cap: int = 10000,
+        count_in_background: bool = False,
+        cache_version_table: str | None = None,
+        arrow_fetch: bool = False,
+        prefetch_pages: bool = False,
+        delete_mode: Literal["auto", "bulk", "orm"] = "auto",
+        allow_import: bool = False,
+        allow_export: bool = False,
+        push_filters: bool = True,
+        instrument: Literal["off", "queries", "explain"] = "off",
+        stage_stats: bool = False,
     ):
         """The CRUD interface will be displayes just by initializing the class
 
@@ -49,7 +84,7 @@ class SqlUi:
             edit_create_default_values (dict, optional): A dict with column name as keys and values to be default. When the user clicks to create a row, those columns will not show on the form and its value will be added to the Model object
             available_filter (list[str], optional): Define wich columns the user will be able to filter in the top expander. Defaults to all
             rolling_total_column (str, optional): A numeric column name of the read_instance. A new column will be displayed with the rolling sum of these column
-            rolling_orderby_colsname (list[str], optional): A list of columns name of the read_instance. It should contain a group of columns that ensures uniqueness of the rows and the order to calculate rolling sum. Usually, it should a date and id column. If not informed, rows will be sorted by id only. Defaults to None
+            rolling_orderby_colsname (list[str], optional): A list of columns name of the read_instance. It should contain a group of columns that ensures uniqueness of the rows and the order to calculate rolling sum. When the user picks a column in *Order by* of the filter expander, rows are ordered by it first and the rolling sum follows that order. Usually, it should a date and id column. If not informed, rows will be sorted by id only. Defaults to None
             df_style_formatter (dict[str,str]): a dictionary where each key is a column name and the associated value is the formatter arg of df.style.format method. See pandas docs for details.
             read_use_container_width (bool, optional): add use_container_width to st.dataframe args. Default to False
             hide_id (bool, optional): The id column will not be displayed if set to True. Defaults to True
@@ -57,11 +92,32 @@ class SqlUi:
             style_fn (Callable[[pd.Series], list[str]], optional): A function that goes into the *func* argument of *df.style.apply*. The apply method also receives *axis=1*, so it works on rows. It can be used to apply conditional css formatting on each column of the row. See Styler.apply info on pandas docs. Defaults to None
             update_show_many (bool, optional): Show a st.expander of one-to-many relations in edit or create dialog
             disable_log (bool): Every change in the database (READ, UPDATE, DELETE) is logged to stderr by default. If this is *true*, nothing is logged. To customize the logging format and where it logs to, use loguru as add a new sink to logger. See loguru docs for more information. Dafaults to False
+            keyset_pagination (bool, optional): Paginate seeking on the order columns (the column chosen in *Order by*, *rolling_orderby_colsname* and id) instead of OFFSET/LIMIT, so far pages cost about the same as the first one. Rows are always ordered by these columns, which should not contain NULL values. Pages already visited are bookmarked in session state. Defaults to False
+            single_query (bool, optional): Fetch the page rows, the quantity of rows and the rolling sum in a single query using window functions. If the database does not support window functions, separate queries are used. Defaults to False
+            balance_checkpoint_rows (int, optional): Keep the rolling sum of *rolling_total_column* every this number of rows, shared by all sessions, so the previous balance is read from the nearest checkpoint instead of summing every earlier row. Checkpoints are patched by create, update and delete made by this package. Changes made by other means are not seen, so only use it if the table is edited through this package. Defaults to None (disabled)
+            filter_discovery (str, optional): How existing values of filter columns are read. *sequential* runs one query per column, *union* reads all columns in a single query and *threads* runs the queries per column concurrently using the connection pool. Time taken is logged at DEBUG level. Defaults to sequential
+            filter_search_cols (list[str], optional): Text columns of *available_filter* with too many distinct values to list. Instead of loading all existing values, the user types the beginning of the value and only matching values are queried and offered. Defaults to None
+            count_strategy (str, optional): How the quantity of rows after filtering is counted. *exact* counts all rows. *capped* stops counting at *count_cap* rows and shows the total as "N+". *estimated* uses the query planner estimate (PostgreSQL only, otherwise capped). Ignored with *single_query*. Defaults to exact
+            count_cap (int, optional): Maximum rows counted by the capped strategy. Defaults to 10000
+            count_in_background (bool, optional): With a capped or estimated count, also count exactly in a background thread and update the pagination when done. Defaults to False
+            cache_version_table (str, optional): Query results are cached for all sessions and invalidated when this package changes a table they read from. To also see changes made by other means, name a table with columns *table_name* and *version* that is incremented on every change (e.g. by triggers). It is polled at most every few seconds. Defaults to None
+            arrow_fetch (bool, optional): Build the page as a pyarrow Table straight from the cursor, with enum columns dictionary encoded, and display it as an Arrow backed DataFrame instead of object dtype columns. *df* will have pyarrow dtypes. If there is no *df_style_formatter* or *style_fn*, the DataFrame is displayed without a Styler. Defaults to False
+            prefetch_pages (bool, optional): After showing a page, fetch the previous and next pages in background threads and keep a few pages in session state, so navigating to them does not wait for the database. With *keyset_pagination*, only pages already bookmarked are prefetched. Defaults to False
+            delete_mode (str, optional): *bulk* deletes the selected rows with DELETE ... WHERE id IN, in chunks, reading the deleted rows for the log with RETURNING when the database supports it. *orm* loads and deletes each row with the session, running ORM cascades and events. *auto* uses *orm* only if the model has delete cascades, many-to-many relationships or delete events. Defaults to auto
+            allow_import (bool, optional): Show a button to insert rows from a CSV or Parquet file. File columns are matched to *edit_create_model* columns by name and converted like the create form, with ForeignKey columns accepting the string representation of the foreign row. Rows are inserted in batches, reporting rows rejected in each batch. Defaults to False
+            allow_export (bool, optional): Show a popover to download all rows matching the filters as CSV, Parquet or Arrow IPC, with the rolling balance column. Rows are streamed from a server side cursor and written to a temporary file in batches, never loading the whole result in a DataFrame. Defaults to False
+            push_filters (bool, optional): When *read_instance* is a Select or a Model without GROUP BY, DISTINCT, LIMIT or aggregate and window functions, apply the filters in its WHERE and read it as a subquery, so they reach the base tables even on databases that materialize CTEs. Date filters stay outside when there is a *rolling_total_column*, because the balance sums the rows before them. Defaults to True
+            instrument (str, optional): *queries* records each statement issued during the rerun with the function that issued it, its time and rows, shows them in a Queries expander at the bottom of the page and logs them to loguru with the record bound as *stsql_query*. Slow queries are logged as warnings. *explain* also runs EXPLAIN for each SELECT after the rerun. Defaults to off
+            stage_stats (bool, optional): Add the stage timings of each rerun to the last 1000 reruns of all sessions with the same *base_key*, or the same *edit_create_model* if there is no *base_key*, and set *stage_percentiles* with their p50, p95 and p99. Defaults to False
 
         Attributes:
             df (pd.Dataframe): The Dataframe displayed in the screen
             selected_rows (list[int]): The position of selected rows. This is not the row id.
             qtty_rows (int): The quantity of all rows after filtering
+            qtty_rows_kind (str): *exact*, or *capped* / *estimated* if qtty_rows is approximate
+            queries (list[QueryRecord]): Statements recorded when *instrument* is not off
+            timings (dict[str, float]): Seconds spent in each stage of the rerun: bootstrap, filter, count, pagination, balance, fetch, convert, style, render, export and crud. Stages that didn't run are missing. Also logged at DEBUG level
+            stage_percentiles (dict[str, dict[str, float]]): p50, p95 and p99 of the seconds of each stage, with the quantity of samples, when *stage_stats* is True
 
 
         Examples:
@@ -105,6 +161,23 @@ class SqlUi:
                 style_fn=style_fn,
                 update_show_many=True,
                 disable_log=False,
+                keyset_pagination=False,
+                single_query=False,
+                balance_checkpoint_rows=None,
+                filter_discovery="sequential",
+                filter_search_cols=["name"],
+                count_strategy="exact",
+                count_cap=10000,
+                count_in_background=False,
+                cache_version_table=None,
+                arrow_fetch=False,
+                prefetch_pages=False,
+                delete_mode="auto",
+                allow_import=False,
+                allow_export=False,
+                push_filters=True,
+                instrument="off",
+                stage_stats=False,
             )
 
             ```
@@ -124,41 +197,84 @@ class SqlUi:
         self.style_fn = style_fn
         self.update_show_many = update_show_many
         self.disable_log = disable_log
-
-        self.cte = self.get_cte()
-        self.rolling_pretty_name = lib.get_pretty_name(self.rolling_total_column or "")
+        self.keyset_pagination = keyset_pagination
+        self.single_query = single_query
+        self.balance_checkpoint_rows = balance_checkpoint_rows
+        self.filter_discovery = filter_discovery
+        self.filter_search_cols = filter_search_cols or []
+        self.count_strategy = count_strategy
+        self.count_cap = count_cap
+        self.count_in_background = count_in_background
+        self.cache_version_table = cache_version_table
+        self.arrow_fetch = arrow_fetch
+        self.prefetch_pages = prefetch_pages
+        self.delete_mode = delete_mode
+        self.allow_import = allow_import
+        self.allow_export = allow_export
+        self.push_filters = push_filters
+        self.instrument = instrument
+        self.stage_stats = stage_stats
+        self.queries: list[inspector.QueryRecord] = []
+        self.timer = profiler.StageTimer()
+        self.stage_percentiles: dict[str, dict[str, float]] = {}
+        self.keyset_pag: keyset.KeysetPagination | None = None
+        self.sort: tuple[str, bool] | None = None
 
         # Bootstrap
-        self.set_initial_state()
-        self.set_structure()
-        self.notification()
-        lib.set_logging(self.disable_log)
+        recorder = None
+        with self.timer.stage("bootstrap"):
+            self.base_stmt = self.get_base_stmt()
+            self.cte = self.get_cte()
+            self.columns = columns.get_columns(self.cte)
+            self.coercions = self.columns.coercions
+            self.rolling_pretty_name = lib.get_pretty_name(
+                self.rolling_total_column or ""
+            )
+
+            self.set_initial_state()
+            self.set_structure()
+            self.notification()
+            lib.set_logging(self.disable_log)
+            if self.instrument != "off":
+                recorder = inspector.start(self.conn.engine)
+            if self.cache_version_table:
+                versions = cache.get_table_versions()
+                versions.poll(self.conn.engine, self.cache_version_table)
 
         # Create UI
-        col_filter = self.filter()
-        stmt_no_pag = read_cte.get_stmt_no_pag(self.cte, col_filter)
-        qtty_rows = read_cte.get_qtty_rows(self.conn, stmt_no_pag)
-        items_per_page, page = self.pagination(qtty_rows, col_filter)
-        stmt_pag = read_cte.get_stmt_pag(stmt_no_pag, items_per_page, page)
-        initial_balance = self.get_initial_balance(
-            self.cte,
-            stmt_pag,
-            col_filter.no_dt_filters,
-            rolling_total_column,
-            self.rolling_orderby_colsname,
-        )
-        df = self.get_df(stmt_pag, initial_balance)
+        with self.timer.stage("filter"):
+            col_filter = self.filter()
+            self.sort = read_cte.get_sort(
+                self.expander_container, self.cte, self.base_key
+            )
+        dialect = self.conn.engine.dialect
+        if self.single_query and read_cte.has_window_functions(dialect):
+            df, qtty_rows = self.read_window(col_filter)
+        else:
+            df, qtty_rows = self.read(col_filter)
         selection_state = self.show_df(df)
         rows_selected = self.get_rows_selected(selection_state)
 
+        if self.allow_export:
+            with self.timer.stage("export"):
+                self.export(col_filter)
+
         # CRUD
-        self.crud(df, rows_selected)
+        with self.timer.stage("crud"):
+            self.crud(df, rows_selected)
         ss.stsql_opened = False
+        self.record_timings()
+
+        if recorder is not None:
+            with_plan = self.instrument == "explain"
+            self.queries = inspector.stop(recorder, self.conn.engine, with_plan)
+            self.show_queries()
 
         # Returns
         self.df = df
         self.rows_selected = rows_selected
-        self.qtty_rows = qtty_rows
+        self.qtty_rows = qtty_rows.value
+        self.qtty_rows_kind = qtty_rows.kind
 
     def set_initial_state(self):
         lib.set_state("stsql_updated", 1)
@@ -199,6 +315,18 @@ class SqlUi:
                 ss.stsql_update_message, icon=":material/thumb_down:"
             )
 
+    def get_base_stmt(self) -> Select | None:
+        """read_instance as a Select that filters can be pushed into, if possible"""
+        if not self.push_filters or isinstance(self.read_instance, CTE):
+            return None
+
+        stmt = self.read_instance
+        if not isinstance(stmt, Select):
+            stmt = select(stmt)
+        if not read_cte.can_push_filters(stmt):
+            return None
+        return stmt
+
     def get_cte(self):
         if isinstance(self.read_instance, Select):
             cte = self.read_instance.cte()
@@ -207,15 +335,31 @@ class SqlUi:
         else:
             cte = select(self.read_instance).cte()
 
-        if self.rolling_total_column:
-            orderby_cols = [
-                cte.columns.get(colname) for colname in self.rolling_orderby_colsname
-            ]
-            orderby_cols = [col for col in orderby_cols if col is not None]
-            cte = select(cte).order_by(*orderby_cols).cte()
-
         return cte
 
+    def get_read_source(self, col_filter: read_cte.ColFilter):
+        return read_cte.get_read_source(
+            self.cte,
+            col_filter,
+            self.base_stmt,
+            keep_dt_filters=self.balance_before_dates(col_filter),
+        )
+
+    def balance_before_dates(self, col_filter: read_cte.ColFilter):
+        """The balance starts with the rows before the date filters
+
+        Only when the rows they keep are contiguous in the order of the rows,
+        otherwise the balance sums just the rows kept, like the other filters.
+        """
+        if self.rolling_total_column is None:
+            return False
+
+        first_colname = self.get_keys(self.cte)[0][0]
+        return all(
+            colname == first_colname or not any(dates)
+            for colname, dates in col_filter.dt_filters.items()
+        )
+
     def filter(self):
         filter_colsname = self.available_filter
         if len(filter_colsname) == 0:
@@ -227,8 +371,9 @@ class SqlUi:
             existing = read_cte.get_existing_values(
                 _session=s,
                 cte=self.cte,
-                updated=ss.stsql_updated,
                 available_col_filter=filter_colsname,
+                strategy=self.filter_discovery,
+                search_cols=self.filter_search_cols,
             )
 
         col_filter = read_cte.ColFilter(
@@ -237,94 +382,407 @@ class SqlUi:
             existing,
             filter_colsname,
             self.base_key,
+            self.filter_search_cols,
+            self.search_filter_values,
         )
         if str(col_filter) != "":
             self.filter_container.write(col_filter)
 
         return col_filter
 
-    def pagination(self, qtty_rows: int, col_filter: read_cte.ColFilter):
+    def search_filter_values(self, colname: str, prefix: str):
+        with self.conn.session as s:
+            values = read_cte.search_values(
+                _session=s,
+                cte=self.cte,
+                colname=colname,
+                prefix=prefix,
+            )
+        return values
+
+    def get_keys(self, from_: CTE | Subquery):
+        """Order of the rows: the chosen sort column, then rolling_orderby_colsname"""
+        keys = keyset.get_keys(from_, self.rolling_orderby_colsname)
+        if self.sort is None:
+            return keys
+
+        sort_colname, desc = self.sort
+        keys = [(sort_colname, desc)] + [k for k in keys if k[0] != sort_colname]
+        return keys
+
+    def reset_page(self, page: int, col_filter: read_cte.ColFilter):
+        filters = {
+            **col_filter.no_dt_filters,
+            **col_filter.dt_filters,
+            "stsql_sort": self.sort,
+        }
+        if filters != ss.stsql_filters:
+            page = 1
+            ss.stsql_filters = filters
+
+        return page
+
+    def pagination(self, qtty_rows: read_cte.QttyRows, col_filter: read_cte.ColFilter):
         with self.pag_container:
             items_per_page, page = read_cte.show_pagination(
-                qtty_rows,
+                qtty_rows.value,
                 OPTS_ITEMS_PAGE,
                 self.base_key,
+                qtty_rows.kind,
             )
 
-        filters = {**col_filter.no_dt_filters, **col_filter.dt_filters}
-        if filters != ss.stsql_filters:
-            page = 1
-            ss.stsql_filters = filters
-
+        page = self.reset_page(page, col_filter)
         return items_per_page, page
 
+    def get_qtty_rows(self, stmt_no_pag: Select):
+        if self.count_strategy == "exact":
+            qtty = read_cte.get_qtty_rows(self.conn, stmt_no_pag)
+            return read_cte.QttyRows(qtty)
+
+        if self.count_in_background:
+            background_counts = read_cte.get_background_counts()
+            engine = self.conn.engine
+            qtty = background_counts.get(engine, stmt_no_pag)
+            if qtty is not None:
+                return read_cte.QttyRows(qtty)
+
+        qtty_rows = None
+        if self.count_strategy == "estimated":
+            estimated = read_cte.estimate_qtty_rows(self.conn, stmt_no_pag)
+            if estimated is not None:
+                qtty_rows = read_cte.QttyRows(estimated, "estimated")
+
+        if qtty_rows is None:
+            capped = read_cte.get_capped_qtty_rows(
+                self.conn, stmt_no_pag, self.count_cap
+            )
+            if capped <= self.count_cap:
+                return read_cte.QttyRows(capped)
+            qtty_rows = read_cte.QttyRows(self.count_cap, "capped")
+
+        if self.count_in_background:
+            self.wait_background_count(stmt_no_pag)
+
+        return qtty_rows
+
+    def wait_background_count(self, stmt_no_pag: Select):
+        @st.fragment(run_every=COUNT_POLL_SECONDS)
+        def poll():
+            background_counts = read_cte.get_background_counts()
+            if background_counts.is_done(stmt_no_pag):
+                st.rerun()
+
+        with self.pag_container:
+            poll()
+
+    def read(self, col_filter: read_cte.ColFilter):
+        source = self.get_read_source(col_filter)
+        stmt_no_pag = read_cte.get_stmt_no_pag(source)
+        with self.timer.stage("count"):
+            qtty_rows = self.get_qtty_rows(stmt_no_pag)
+        with self.timer.stage("pagination"):
+            items_per_page, page = self.pagination(qtty_rows, col_filter)
+            exact_qtty = qtty_rows.value if qtty_rows.kind == "exact" else None
+            stmt_pag = self.get_stmt_pag(
+                source.from_, stmt_no_pag, exact_qtty, items_per_page, page
+            )
+        with self.timer.stage("balance"):
+            initial_balance = self.get_initial_balance(
+                source.from_,
+                stmt_pag,
+                source.no_dt_filters,
+                self.rolling_total_column,
+            )
+        offset_stmt = partial(
+            read_cte.get_stmt_pag,
+            self.order_stmt(source.from_, stmt_no_pag),
+            items_per_page,
+        )
+        df = self.get_df(stmt_pag, initial_balance, page, offset_stmt)
+        return df, qtty_rows
+
+    def read_window(self, col_filter: read_cte.ColFilter):
+        source = self.get_read_source(col_filter)
+        subq = read_cte.get_stmt_no_pag_window(
+            source,
+            self.rolling_total_column,
+            self.get_keys(source.from_),
+        )
+        stmt_no_pag = select(subq)
+
+        # The quantity of rows comes with the page, so the pagination is drawn after
+        with self.timer.stage("pagination"):
+            items_per_page, page = read_cte.get_pagination_state(
+                OPTS_ITEMS_PAGE, self.base_key
+            )
+            page = self.reset_page(page, col_filter)
+            if self.keyset_pagination:
+                stmt_pag = self.get_stmt_pag(
+                    subq, stmt_no_pag, None, items_per_page, page
+                )
+            else:
+                orderby = keyset.key_orderby(subq, self.get_keys(subq))
+                stmt_no_pag = stmt_no_pag.order_by(*orderby)
+                stmt_pag = read_cte.get_stmt_pag(stmt_no_pag, items_per_page, page)
+
+        offset_stmt = partial(read_cte.get_stmt_pag, stmt_no_pag, items_per_page)
+        df = self.fetch_df(stmt_pag, page, offset_stmt)
+        with self.timer.stage("count"):
+            if not df.empty:
+                qtty = int(df[read_cte.COUNT_COLNAME].iloc[0])
+            elif page == 1:
+                qtty = 0
+            else:
+                qtty = read_cte.get_qtty_rows(self.conn, stmt_no_pag)
+            qtty_rows = read_cte.QttyRows(qtty)
+            df = df.drop(columns=read_cte.COUNT_COLNAME)
+        with self.timer.stage("pagination"):
+            self.pagination(qtty_rows, col_filter)
+
+        balance = None
+        with self.timer.stage("balance"):
+            if self.rolling_total_column:
+                window_balance = df.pop(read_cte.BALANCE_COLNAME)
+                if self.saldo_toggle() and not df.empty:
+                    balance = window_balance
+                    initial_balance = read_cte.window_opening_balance(
+                        balance, df[self.rolling_total_column]
+                    )
+                    self.show_initial_balance(initial_balance)
+
+        df = self.convert_arrow(df)
+        with self.timer.stage("balance"):
+            df = self.add_balance(df, 0, balance)
+        return df, qtty_rows
+
+    def order_stmt(self, from_: CTE | Subquery, stmt_no_pag: Select):
+        # The balance is summed in key order, so the page has to follow it
+        if self.sort is None and self.rolling_total_column is None:
+            return stmt_no_pag
+
+        orderby = keyset.key_orderby(from_, self.get_keys(from_))
+        return stmt_no_pag.order_by(*orderby)
+
+    def get_stmt_pag(
+        self,
+        from_: CTE | Subquery,
+        stmt_no_pag: Select,
+        qtty_rows: int | None,
+        items_per_page: int,
+        page: int,
+    ):
+        if not self.keyset_pagination:
+            stmt_no_pag = self.order_stmt(from_, stmt_no_pag)
+            return read_cte.get_stmt_pag(stmt_no_pag, items_per_page, page)
+
+        keys = self.get_keys(from_)
+        self.keyset_pag = keyset.KeysetPagination(
+            from_,
+            keys,
+            stmt_no_pag,
+            qtty_rows,
+            items_per_page,
+            self.base_key,
+            enum_labels=self.arrow_fetch,
+        )
+        with self.conn.session as s:
+            stmt_pag = self.keyset_pag.get_stmt_pag(s, page)
+
+        return stmt_pag
+
     def get_initial_balance(
         self,
-        base_cte: CTE,
+        base_cte: CTE | Subquery,
         stmt_pag: Select,
         no_dt_filters: dict,
         rolling_total_column: str | None,
-        rolling_orderby_colsname: list[str],
     ):
         if rolling_total_column is None:
             return 0
 
-        saldo_toogle = self.saldo_toggle_col.toggle(
-            f"Adiciona Saldo Anterior em {self.rolling_pretty_name}",
-            value=True,
-            key=f"{self.base_key}_saldo_toggle_sql_ui",
-        )
-
-        if not saldo_toogle:
+        if not self.saldo_toggle():
             return 0
 
+        initial_balance = self.opening_balance(
+            base_cte, stmt_pag, no_dt_filters, rolling_total_column
+        )
+        self.show_initial_balance(initial_balance)
+        return initial_balance
+
+    def opening_balance(
+        self,
+        base_cte: CTE | Subquery,
+        stmt_pag: Select,
+        no_dt_filters: dict,
+        rolling_total_column: str,
+    ) -> float:
         stmt_no_pag_dt = read_cte.get_stmt_no_pag_dt(base_cte, no_dt_filters)
+        keys = self.get_keys(base_cte)
 
-        orderby_cols = [
-            base_cte.columns.get(colname) for colname in rolling_orderby_colsname
-        ]
-        orderby_cols = [col for col in orderby_cols if col is not None]
         with self.conn.session as s:
-            initial_balance = read_cte.initial_balance(
-                _session=s,
-                stmt_no_pag_dt=stmt_no_pag_dt,
-                stmt_pag=stmt_pag,
-                rolling_total_column=rolling_total_column,
-                orderby_cols=orderby_cols,
-            )
+            if self.balance_checkpoint_rows:
+                initial_balance = balance.opening_balance(
+                    session=s,
+                    from_=base_cte,
+                    keys=keys,
+                    stmt_no_pag_dt=stmt_no_pag_dt,
+                    stmt_pag=stmt_pag,
+                    rolling_total_column=rolling_total_column,
+                    every=self.balance_checkpoint_rows,
+                )
+            else:
+                initial_balance = read_cte.initial_balance(
+                    _session=s,
+                    from_=base_cte,
+                    keys=keys,
+                    stmt_no_pag_dt=stmt_no_pag_dt,
+                    stmt_pag=stmt_pag,
+                    rolling_total_column=rolling_total_column,
+                )
+
+        return initial_balance
+
+    def saldo_toggle(self) -> bool:
+        saldo_toogle = self.saldo_toggle_col.toggle(
+            f"Adiciona Saldo Anterior em {self.rolling_pretty_name}",
+            value=True,
+            key=f"{self.base_key}_saldo_toggle_sql_ui",
+        )
+        return saldo_toogle
 
+    def show_initial_balance(self, initial_balance: float):
         self.saldo_value_col.subheader(
             f"Saldo Anterior {self.rolling_pretty_name}: {initial_balance:,.2f}"
         )
 
-        return initial_balance
-
     def convert_arrow(self, df: pd.DataFrame):
-        cols = self.cte.columns
-        for col in cols:
-            if isinstance(col.type, SQLEnum):
-                col_name = col.name
-                df[col_name] = df[col_name].map(lambda v: v.value)
+        if self.arrow_fetch:
+            return df
 
+        with self.timer.stage("convert"):
+            df = arrow.coerce(df, self.coercions)
         return df
 
-    def get_df(
+    def fetch_df(
         self,
         stmt_pag: Select,
-        initial_balance: float,
+        page: int,
+        offset_stmt: Callable[[int], Select],
     ):
-        with self.conn.connect() as c:
-            df = pd.read_sql(stmt_pag, c)
+        """offset_stmt builds the OFFSET statement of a page, to prefetch others"""
+        prefetcher = None
+        if self.prefetch_pages:
+            # The first page statement changes with filters, order and page size
+            signature = cache.fingerprint(offset_stmt(1))
+            prefetcher = prefetch.get_prefetcher(self.base_key, signature)
+
+        with self.timer.stage("fetch"):
+            df = prefetcher.get(stmt_pag) if prefetcher else None
+            if df is None:
+                with self.conn.connect() as c:
+                    df = arrow.read_page(c, stmt_pag, self.arrow_fetch)
+                if prefetcher:
+                    prefetcher.put(stmt_pag, df)
+
+            if self.keyset_pag is not None:
+                df = self.keyset_pag.record(df, page)
+
+            if prefetcher and not df.empty:
+                self.prefetch(prefetcher, page, offset_stmt)
 
-        df = self.convert_arrow(df)
+        return df
+
+    def prefetch(
+        self,
+        prefetcher: prefetch.PagePrefetcher,
+        page: int,
+        offset_stmt: Callable[[int], Select],
+    ):
+        pages = [p for p in (page + 1, page - 1) if p >= 1]
+        if self.keyset_pag is not None:
+            stmts = [self.keyset_pag.bookmarked_stmt(p) for p in pages]
+        else:
+            stmts = [offset_stmt(p) for p in pages]
+
+        stmts = [stmt for stmt in stmts if stmt is not None]
+        prefetcher.submit(self.conn.engine, stmts, self.arrow_fetch)
+
+    def add_balance(
+        self,
+        df: pd.DataFrame,
+        initial_balance: float,
+        balance: pd.Series | None = None,
+    ):
         if self.rolling_total_column is None:
             return df
 
+        if balance is None:
+            balance = df[self.rolling_total_column].cumsum() + initial_balance
+
         rolling_col_name = f"Balance {self.rolling_pretty_name}"
-        df[rolling_col_name] = df[self.rolling_total_column].cumsum() + initial_balance
+        df[rolling_col_name] = balance
+        return df
 
+    def get_df(
+        self,
+        stmt_pag: Select,
+        initial_balance: float,
+        page: int,
+        offset_stmt: Callable[[int], Select],
+    ):
+        df = self.fetch_df(stmt_pag, page, offset_stmt)
+        df = self.convert_arrow(df)
+        with self.timer.stage("balance"):
+            df = self.add_balance(df, initial_balance)
         return df
 
+    def export(self, col_filter: read_cte.ColFilter):
+        popover = self.pag_container.popover("Export", icon=":material/download:")
+        fmt = popover.selectbox(
+            "Format", list(export.FORMATS), key=f"{self.base_key}_export_fmt"
+        )
+        prepare = popover.button("Prepare file", key=f"{self.base_key}_export_btn")
+        if not prepare:
+            return
+
+        source = self.get_read_source(col_filter)
+        keys = self.get_keys(source.from_)
+        stmt_no_pag = read_cte.get_stmt_no_pag(source)
+        stmt = stmt_no_pag.order_by(*keyset.key_orderby(source.from_, keys))
+
+        export_balance = None
+        toggle_key = f"{self.base_key}_saldo_toggle_sql_ui"
+        if self.rolling_total_column and ss.get(toggle_key, True):
+            initial_balance = self.opening_balance(
+                source.from_,
+                stmt.limit(1),
+                source.no_dt_filters,
+                self.rolling_total_column,
+            )
+            export_balance = export.Balance(
+                self.rolling_total_column,
+                f"Balance {self.rolling_pretty_name}",
+                initial_balance,
+            )
+
+        with popover, st.spinner("Exportando..."):
+            path = export.export_file(self.conn.engine, stmt, fmt, export_balance)
+
+        suffix, mime = export.FORMATS[fmt]
+        file_name = f"{self.edit_create_model.__tablename__}{suffix}"
+        try:
+            with open(path, "rb") as f:
+                popover.download_button(
+                    "Download",
+                    data=f,
+                    file_name=file_name,
+                    mime=mime,
+                    icon=":material/download:",
+                    key=f"{self.base_key}_export_download",
+                )
+        finally:
+            Path(path).unlink()
+
     def add_balance_formatter(self, df_style_formatter: dict[str, str]):
         formatter = {}
         for k, v in df_style_formatter.items():
@@ -344,24 +802,70 @@ class SqlUi:
         if self.hide_id:
             column_order = [colname for colname in df.columns if colname != "id"]
 
-        df_style = df.style
+        column_config = {
+            meta.name: st.column_config.DateColumn(format="YYYY-MM-DD")
+            for meta in self.columns.select()
+            if meta.kind == "date"
+        }
+
         formatter = self.add_balance_formatter(self.df_style_formatter)
-        df_style = df_style.format(formatter)  # pyright: ignore
-        if self.style_fn is not None:
-            df_style = df_style.apply(self.style_fn, axis=1)
-
-        selection_state = self.data_container.dataframe(
-            df_style,
-            use_container_width=self.read_use_container_width,
-            height=650,
-            hide_index=True,
-            column_order=column_order,
-            on_select="rerun",
-            selection_mode="multi-row",
-            key=f"{self.base_key}_df_sql_ui",
-        )
+        if self.arrow_fetch and not formatter and self.style_fn is None:
+            df_style = df
+        else:
+            with self.timer.stage("style"):
+                df_style = df.style
+                df_style = df_style.format(formatter)  # pyright: ignore
+                if self.style_fn is not None:
+                    df_style = df_style.apply(self.style_fn, axis=1)
+
+        # The Styler applies style_fn when serialized, so it is timed in render
+        with self.timer.stage("render"):
+            selection_state = self.data_container.dataframe(
+                df_style,
+                use_container_width=self.read_use_container_width,
+                height=650,
+                hide_index=True,
+                column_order=column_order,
+                column_config=column_config,
+                on_select="rerun",
+                selection_mode="multi-row",
+                key=f"{self.base_key}_df_sql_ui",
+            )
         return selection_state
 
+    def record_timings(self):
+        self.timings = self.timer.timings
+        lib.log_timings("rerun", self.timings)
+        if not self.stage_stats:
+            return
+
+        key = self.base_key or self.edit_create_model.__tablename__
+        stats = profiler.get_stage_stats(key)
+        stats.add(self.timings)
+        self.stage_percentiles = stats.percentiles()
+
+    def show_queries(self):
+        total = sum(record.seconds for record in self.queries)
+        label = f"Queries: {len(self.queries)} in {total:.3f}s"
+        with st.expander(label, icon=":material/query_stats:"):
+            records = [record.as_dict() for record in self.queries]
+            df = pd.DataFrame(
+                records, columns=["component", "seconds", "rows", "slow", "sql"]
+            )
+            st.dataframe(
+                df,
+                hide_index=True,
+                column_config={"seconds": st.column_config.NumberColumn(format="%.4f")},
+            )
+            for i, record in enumerate(self.queries, start=1):
+                if record.plan is None and not record.slow:
+                    continue
+                slow = " :red[slow]" if record.slow else ""
+                st.markdown(f"**{i}. {record.path}**{slow}")
+                st.code(record.sql, language="sql")
+                if record.plan is not None:
+                    st.code(record.plan)
+
     def get_rows_selected(self, selection_state: DataframeState | None):
         rows_pos = []
         if (
@@ -379,6 +883,7 @@ class SqlUi:
             self.btns_container,
             qtty_rows,
             ss.stsql_opened,
+            self.allow_import,
         )
 
         if action == "add":
@@ -388,6 +893,22 @@ class SqlUi:
                 default_values=self.edit_create_default_values,
             )
             create_row.show_dialog()
+        elif action == "import":
+            import_rows = import_model.ImportRows(
+                conn=self.conn,
+                Model=self.edit_create_model,
+                default_values=self.edit_create_default_values,
+            )
+            import_rows.show_dialog()
+        elif action == "edit" and qtty_rows > 1:
+            rows_id = df.iloc[rows_selected].id.astype(int).to_list()
+            update_rows = update_model.UpdateRows(
+                conn=self.conn,
+                Model=self.edit_create_model,
+                rows_id=rows_id,
+                default_values=self.edit_create_default_values,
+            )
+            update_rows.show_dialog()
         elif action == "edit":
             selected_pos = rows_selected[0]
             row_id = int(df.iloc[selected_pos]["id"])
@@ -405,6 +926,7 @@ class SqlUi:
                 conn=self.conn,
                 Model=self.edit_create_model,
                 rows_id=rows_id,
+                mode=self.delete_mode,
             )
             delete_rows.show_dialog()
 
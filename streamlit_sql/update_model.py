@@ -1,14 +1,16 @@
 import streamlit as st
-from sqlalchemy import select
+from sqlalchemy import select, update
 from sqlalchemy.orm import DeclarativeBase
 from streamlit import session_state as ss
 from streamlit.connections.sql_connection import SQLConnection
 from streamlit.delta_generator import DeltaGenerator
 
 from streamlit_sql import many
+from streamlit_sql.balance import get_store
+from streamlit_sql.cache import bump_tables
 from streamlit_sql.filters import ExistingData
 from streamlit_sql.input_fields import InputFields
-from streamlit_sql.lib import get_pretty_name, log, set_state
+from streamlit_sql.lib import get_pretty_name, in_chunks, log, set_state
 
 
 class UpdateRow:
@@ -56,8 +58,11 @@ class UpdateRow:
         return updated
 
     def save(self, updated: dict):
+        table_name = self.Model.__tablename__
+        store = get_store()
         with self.conn.session as s:
             try:
+                before = store.snapshot(s, table_name, [updated["id"]])
                 stmt = select(self.Model).where(
                     self.Model.__table__.columns.id == updated["id"]
                 )
@@ -67,6 +72,8 @@ class UpdateRow:
 
                 s.add(row)
                 s.commit()
+                bump_tables(table_name)
+                store.patch(s, table_name, [updated["id"]], before)
                 log("UPDATE", self.Model.__tablename__, row)
                 return True, f"Atualizado com sucesso {row}"
             except Exception as e:
@@ -78,6 +85,7 @@ class UpdateRow:
     def show(self):
         pretty_name = get_pretty_name(self.Model.__tablename__)
         st.subheader(pretty_name)
+        self.input_fields.fk_search_inputs()
         with st.form(f"update_model_form_{pretty_name}", border=False):
             updated = self.get_updates()
             update_btn = st.form_submit_button("Save")
@@ -109,14 +117,134 @@ class UpdateRow:
         wrap_show_update()
 
 
-def action_btns(container: DeltaGenerator, qtty_selected: int, opened: bool):
+class UpdateRows:
+    """Set the same values on many rows with UPDATE ... WHERE id IN"""
+
+    def __init__(
+        self,
+        conn: SQLConnection,
+        Model: type[DeclarativeBase],
+        rows_id: list[int],
+        default_values: dict | None = None,
+        base_key: str = "stsql_update_rows",
+    ) -> None:
+        self.conn = conn
+        self.Model = Model
+        self.rows_id = rows_id
+        self.default_values = default_values or {}
+        self.base_key = base_key
+
+        set_state("stsql_updated", 0)
+
+        with conn.session as s:
+            self.existing_data = ExistingData(s, Model, self.default_values)
+
+        self.input_fields = InputFields(
+            Model, base_key, self.default_values, self.existing_data
+        )
+
+    def get_editable_cols(self):
+        cols = [
+            col
+            for col in self.Model.__table__.columns
+            if not col.primary_key and col.description not in self.default_values
+        ]
+        return cols
+
+    def get_updates(self, colsname: list[str]):
+        cols = self.Model.__table__.columns
+        updated = {
+            colname: self.input_fields.get_input_value(cols[colname], None)
+            for colname in colsname
+        }
+        return updated
+
+    def save(self, updated: dict):
+        table_name = self.Model.__tablename__
+        id_col = self.Model.__table__.columns.get("id")
+        assert id_col is not None
+        updated_list = [f"{k}: {v}" for k, v in updated.items()]
+        updated_str = ", ".join(updated_list)
+        store = get_store()
+        with self.conn.session as s:
+            try:
+                before = store.snapshot(s, table_name, self.rows_id)
+                dialect_name = s.get_bind().dialect.name
+                qtty = 0
+                for chunk in in_chunks(self.rows_id, dialect_name):
+                    stmt = (
+                        update(self.Model)
+                        .where(id_col.in_(chunk))
+                        .values(**updated)
+                        .execution_options(synchronize_session=False)
+                    )
+                    qtty += s.execute(stmt).rowcount
+
+                s.commit()
+                bump_tables(table_name)
+                store.patch(s, table_name, self.rows_id, before)
+                log("UPDATE", table_name, f"{qtty} rows, {updated_str}")
+                return True, f"Atualizado com sucesso {qtty} registros"
+            except Exception as e:
+                log("UPDATE", table_name, updated_str, success=False)
+                return False, str(e)
+
+    def show(self):
+        pretty_name = get_pretty_name(self.Model.__tablename__)
+        st.subheader(f"{pretty_name} - {len(self.rows_id)} registros")
+
+        cols = self.get_editable_cols()
+        colsname = st.multiselect(
+            "Fields to change",
+            options=[col.description for col in cols],
+            format_func=get_pretty_name,
+            key=f"{self.base_key}_cols",
+        )
+        if not colsname:
+            return None, None
+
+        self.input_fields.fk_search_inputs(colsname)
+        with st.form(f"update_rows_form_{pretty_name}", border=False):
+            updated = self.get_updates(colsname)
+            update_btn = st.form_submit_button("Save")
+
+        if update_btn:
+            ss.stsql_updated += 1
+            return self.save(updated)
+        return None, None
+
+    def show_dialog(self):
+        pretty_name = get_pretty_name(self.Model.__tablename__)
+
+        @st.dialog(f"Edit {pretty_name}", width="large")  # pyright: ignore
+        def wrap_show_update():
+            set_state("stsql_updated", 0)
+            updated_before = ss.stsql_updated
+            status, msg = self.show()
+
+            ss.stsql_update_ok = status
+            ss.stsql_update_message = msg
+            ss.stsql_opened = True
+
+            if ss.stsql_updated > updated_before:
+                st.rerun()
+
+        wrap_show_update()
+
+
+def action_btns(
+    container: DeltaGenerator,
+    qtty_selected: int,
+    opened: bool,
+    show_import: bool = False,
+):
     set_state("stsql_action", "")
     disabled_add = qtty_selected > 0
-    disabled_edit = qtty_selected != 1
+    disabled_edit = qtty_selected == 0
     disabled_delete = qtty_selected == 0
 
     with container:
-        add_col, edit_col, del_col, _empty_col = st.columns([1, 1, 1, 6])
+        add_col, edit_col, del_col, import_col, _empty_col = st.columns([1, 1, 1, 1, 5])
 
         add_btn = add_col.button(
             "",
@@ -145,8 +273,21 @@ def action_btns(container: DeltaGenerator, qtty_selected: int, opened: bool):
             use_container_width=True,
         )
 
+        import_btn = False
+        if show_import:
+            import_btn = import_col.button(
+                "",
+                help="Import",
+                icon=":material/upload_file:",
+                type="secondary",
+                disabled=disabled_add,
+                use_container_width=True,
+            )
+
         if opened:
             return None
+        if import_btn:
+            return "import"
         if add_btn:
             return "add"
         if edit_btn:
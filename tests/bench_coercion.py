@@ -0,0 +1,115 @@
+"""Page read and coercion of convert_arrow, before and after vectorizing it
+
+Run with: python -m tests.bench_coercion
+"""
+
+import enum
+import timeit
+from datetime import date, timedelta
+from decimal import Decimal
+from functools import partial
+
+import pandas as pd
+from sqlalchemy import Enum, Numeric, create_engine, select
+from sqlalchemy.orm import DeclarativeBase, Mapped, Session, mapped_column
+
+from streamlit_sql import arrow, columns
+
+SIZES = (1000, 10000, 60000)
+REPEAT = 5
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+class Kind(enum.Enum):
+    a = "A"
+    b = "B"
+    c = "C"
+
+
+class Invoice(Base):
+    __tablename__ = "invoice"
+    id: Mapped[int] = mapped_column(primary_key=True)
+    date: Mapped[date]
+    amount: Mapped[Decimal] = mapped_column(Numeric(10, 2))
+    kind: Mapped[Kind] = mapped_column(Enum(Kind))
+
+
+def old_convert(df: pd.DataFrame, cte):
+    """convert_arrow before vectorizing: one lambda call per enum cell"""
+    for col in cte.columns:
+        if isinstance(col.type, Enum):
+            df[col.name] = df[col.name].map(lambda v: v.value)
+    return df
+
+
+def old_convert_copy(df: pd.DataFrame, cte):
+    return old_convert(df.copy(), cte)
+
+
+def new_convert_copy(df: pd.DataFrame, coercions):
+    return arrow.coerce(df.copy(), coercions)
+
+
+def old_read(conn, stmt, cte):
+    return old_convert(pd.read_sql(stmt, conn), cte)
+
+
+def new_read(conn, stmt, cte):
+    df = arrow.read_page(conn, stmt)
+    return arrow.coerce(df, columns.get_columns(cte).coercions)
+
+
+def best_ms(fn) -> float:
+    return min(timeit.repeat(fn, number=1, repeat=REPEAT)) * 1000
+
+
+def build(size: int):
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    kinds = list(Kind)
+    with Session(engine) as s:
+        s.add_all(
+            Invoice(
+                date=date(2020, 1, 1) + timedelta(days=i % 365),
+                amount=Decimal(i % 1000) / 10,
+                kind=kinds[i % len(kinds)],
+            )
+            for i in range(size)
+        )
+        s.commit()
+    return engine
+
+
+def main():
+    print(f"{'rows':>6} {'step':<14} {'old ms':>8} {'new ms':>8}")
+    for size in SIZES:
+        engine = build(size)
+        cte = select(Invoice).cte()
+        stmt = select(cte)
+        with engine.connect() as conn:
+            members = pd.read_sql(stmt, conn)
+            stored = arrow.read_page(conn, stmt)
+            coercions = columns.get_columns(cte).coercions
+            old_df = old_read(conn, stmt, cte)
+            new_df = new_read(conn, stmt, cte)
+            assert old_df["kind"].tolist() == new_df["kind"].tolist()
+
+            steps = {
+                "coercion": (
+                    partial(old_convert_copy, members, cte),
+                    partial(new_convert_copy, stored, coercions),
+                ),
+                "read+coercion": (
+                    partial(old_read, conn, stmt, cte),
+                    partial(new_read, conn, stmt, cte),
+                ),
+            }
+            for step, (old, new) in steps.items():
+                print(f"{size:>6} {step:<14} {best_ms(old):>8.2f} {best_ms(new):>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
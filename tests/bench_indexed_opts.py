@@ -0,0 +1,31 @@
+"""Option lookups of IndexedOpts against the list.index scan they replaced
+
+Run with: python -m tests.bench_indexed_opts
+"""
+
+import timeit
+from functools import partial
+
+from streamlit_sql.filters import FkOpt, IndexedOpts
+
+SIZES = (10, 1000, 100000)
+LOOKUPS = 1000
+
+
+def main():
+    print(f"{'options':>8} {'list.index us':>14} {'index_of us':>12}")
+    for size in SIZES:
+        values = [FkOpt(i, f"Name {i}") for i in range(size)]
+        opts = IndexedOpts(values)
+        last = values[-1]
+        assert values.index(last) == opts.index_of(last.idx)
+
+        scan = timeit.timeit(partial(values.index, last), number=LOOKUPS)
+        indexed = timeit.timeit(partial(opts.index_of, last.idx), number=LOOKUPS)
+        print(
+            f"{size:>8} {scan / LOOKUPS * 1e6:>14.3f} {indexed / LOOKUPS * 1e6:>12.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
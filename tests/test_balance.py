@@ -0,0 +1,29 @@
+from sqlalchemy import Column, Integer, MetaData, Table, select
+
+from streamlit_sql.balance import CheckpointStore
+
+metadata = MetaData()
+entry = Table(
+    "entry",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("amount", Integer),
+)
+
+
+def get_index(store: CheckpointStore, above: int):
+    subq = select(entry).subquery()
+    stmt = select(subq).where(subq.c.amount > above)
+    return store.get_index(subq, [("id", False)], stmt, "amount", 10)
+
+
+def test_store_drops_least_recently_used():
+    store = CheckpointStore(max_indexes=2)
+    first = get_index(store, 1)
+    get_index(store, 2)
+    assert get_index(store, 1) is first
+
+    get_index(store, 3)
+    assert len(store.indexes) == 2
+    assert get_index(store, 1) is first
+    assert len(store.indexes) == 2
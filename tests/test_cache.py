@@ -0,0 +1,78 @@
+import enum
+
+from sqlalchemy import (
+    Column,
+    Enum,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    literal,
+    literal_column,
+    select,
+)
+
+from streamlit_sql.cache import fingerprint
+
+
+class Kind(enum.Enum):
+    a = "A"
+    b = "B"
+
+
+metadata = MetaData()
+invoice = Table(
+    "invoice",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("descr", String),
+    Column("kind", Enum(Kind)),
+)
+
+
+def same(build) -> bool:
+    """Two statements built separately have the same fingerprint"""
+    return fingerprint(build()) == fingerprint(build())
+
+
+def test_limit_offset():
+    def page(offset: int):
+        return select(invoice).order_by(invoice.c.id).limit(50).offset(offset)
+
+    assert same(lambda: page(100))
+    assert fingerprint(page(100)) != fingerprint(page(150))
+    assert fingerprint(page(100)) != fingerprint(page(100).limit(20))
+
+
+def test_in_list():
+    def where_in(values: list[int]):
+        return select(invoice).where(invoice.c.id.in_(values))
+
+    assert same(lambda: where_in([1, 2, 3]))
+    assert fingerprint(where_in([1, 2, 3])) != fingerprint(where_in([1, 2, 4]))
+    assert fingerprint(where_in([1, 2])) != fingerprint(where_in([1, 2, 3]))
+
+
+def test_literals():
+    def where_descr(descr: str):
+        return select(invoice).where(invoice.c.descr == descr)
+
+    assert same(lambda: where_descr("item"))
+    assert fingerprint(where_descr("item")) != fingerprint(where_descr("other"))
+    assert fingerprint(select(literal(1))) != fingerprint(select(literal(2)))
+    assert fingerprint(select(literal_column("1"))) != fingerprint(
+        select(literal_column("2"))
+    )
+
+
+def test_enums():
+    def where_kind(kind: Kind):
+        return select(invoice).where(invoice.c.kind == kind)
+
+    assert same(lambda: where_kind(Kind.a))
+    assert fingerprint(where_kind(Kind.a)) != fingerprint(where_kind(Kind.b))
+
+
+def test_cached_per_statement():
+    stmt = select(invoice).where(invoice.c.id == 1)
+    assert fingerprint(stmt) is fingerprint(stmt)
@@ -0,0 +1,68 @@
+import copy
+
+from sqlalchemy import Column, Integer, MetaData, String, Table, create_engine, select
+from sqlalchemy.orm import Session
+
+from streamlit_sql import read_cte
+from streamlit_sql.conditions import NOT_NULL, ColCond, cond_clauses, from_selected
+
+metadata = MetaData()
+note = Table(
+    "note",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("text", String),
+)
+
+
+def select_ids(selected: list) -> list[int]:
+    engine = create_engine("sqlite://")
+    metadata.create_all(engine)
+    with engine.begin() as c:
+        c.execute(
+            note.insert(),
+            [{"id": 1, "text": "x"}, {"id": 2, "text": "y"}, {"id": 3, "text": None}],
+        )
+        # Streamlit deep copies the values of widgets
+        cond = from_selected(copy.deepcopy(selected))
+        stmt = select(note.c.id).where(*cond_clauses(note.c.text, cond))
+        return list(c.execute(stmt.order_by(note.c.id)).scalars())
+
+
+def test_not_null_survives_deepcopy():
+    assert copy.deepcopy(NOT_NULL) == NOT_NULL
+    assert from_selected(copy.deepcopy([NOT_NULL])).null is False
+
+
+def test_not_null_selection():
+    assert select_ids([NOT_NULL]) == [1, 2]
+
+
+def test_values_with_not_null():
+    cond = from_selected(copy.deepcopy(["x", NOT_NULL]))
+    assert cond.values == ("x",)
+    assert cond.null is False
+    assert select_ids(["x", NOT_NULL]) == [1]
+
+
+def test_values_with_null():
+    assert select_ids(["x", None]) == [1, 3]
+
+
+def test_prefix_options_match_prefix_filter():
+    engine = create_engine("sqlite://")
+    metadata.create_all(engine)
+    texts = ["Client 01", "client 02", "CLI", "clj", "cl"]
+    with Session(engine) as s:
+        s.execute(note.insert(), [{"text": text} for text in texts])
+        cte = select(note).cte()
+        offered = read_cte.search_values(
+            _session=s, cte=cte, colname="text", prefix="cli"
+        )
+
+        cond = ColCond(prefix="cli")
+        stmt = select(note.c.text).where(*cond_clauses(note.c.text, cond))
+        kept = list(s.execute(stmt).scalars())
+
+    assert offered == ["client 02"]
+    assert kept == offered
@@ -0,0 +1,62 @@
+from sqlalchemy import Column, ForeignKey, Table
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
+
+from streamlit_sql.create_delete_model import needs_orm_delete, orm_delete_tables
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+author_tag = Table(
+    "author_tag",
+    Base.metadata,
+    Column("author_id", ForeignKey("author.id"), primary_key=True),
+    Column("tag_id", ForeignKey("tag.id"), primary_key=True),
+)
+
+
+class Tag(Base):
+    __tablename__ = "tag"
+    id: Mapped[int] = mapped_column(primary_key=True)
+
+
+class Author(Base):
+    __tablename__ = "author"
+    id: Mapped[int] = mapped_column(primary_key=True)
+    books: Mapped[list["Book"]] = relationship(cascade="all, delete-orphan")
+    tags: Mapped[list[Tag]] = relationship(secondary=author_tag)
+
+
+class Book(Base):
+    __tablename__ = "book"
+    id: Mapped[int] = mapped_column(primary_key=True)
+    author_id: Mapped[int] = mapped_column(ForeignKey("author.id"))
+    author: Mapped[Author] = relationship(viewonly=True)
+    reviews: Mapped[list["Review"]] = relationship(cascade="all, delete")
+    notes: Mapped[list["Note"]] = relationship()
+
+
+class Review(Base):
+    __tablename__ = "review"
+    id: Mapped[int] = mapped_column(primary_key=True)
+    book_id: Mapped[int] = mapped_column(ForeignKey("book.id"))
+
+
+class Note(Base):
+    __tablename__ = "note"
+    id: Mapped[int] = mapped_column(primary_key=True)
+    book_id: Mapped[int | None] = mapped_column(ForeignKey("book.id"))
+
+
+def test_orm_delete_tables_follow_cascades():
+    assert needs_orm_delete(Author)
+    assert orm_delete_tables(Author) == {
+        "author",
+        "author_tag",
+        "book",
+        "review",
+        "note",
+    }
+    assert orm_delete_tables(Book) == {"book", "review", "note"}
+    assert orm_delete_tables(Review) == {"review"}
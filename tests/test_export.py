@@ -0,0 +1,30 @@
+import tempfile
+
+import pytest
+from sqlalchemy import Column, Integer, MetaData, Table, create_engine, select
+from sqlalchemy.exc import OperationalError
+
+from streamlit_sql.export import export_file
+
+metadata = MetaData()
+missing = Table("missing", metadata, Column("id", Integer, primary_key=True))
+
+
+def test_file_removed_on_error(tmp_path, monkeypatch):
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    engine = create_engine("sqlite://")
+    with pytest.raises(OperationalError):
+        export_file(engine, select(missing), "CSV")
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_file_written(tmp_path, monkeypatch):
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    engine = create_engine("sqlite://")
+    metadata.create_all(engine)
+    with engine.begin() as c:
+        c.execute(missing.insert(), [{"id": 1}, {"id": 2}])
+
+    path = export_file(engine, select(missing), "CSV")
+    with open(path) as f:
+        assert f.read().split() == ['"id"', "1", "2"]
@@ -0,0 +1,70 @@
+from datetime import date, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import DeclarativeBase, Mapped, Session, mapped_column
+
+from streamlit_sql import filters
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+class Event(Base):
+    __tablename__ = "event_dt_defaults"
+    id: Mapped[int] = mapped_column(primary_key=True)
+    day: Mapped[date | None]
+
+
+class Tomorrow(date):
+    @classmethod
+    def today(cls):
+        return date.today() + timedelta(days=1)
+
+
+def test_dt_defaults_follow_today(monkeypatch):
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as s:
+        today = date.today()
+        assert filters.ExistingData(s, Event, {}).dt["day"] == (
+            today - timedelta(days=30),
+            today,
+        )
+
+        # The min and max are cached, the defaults of the empty column are not
+        monkeypatch.setattr(filters, "date", Tomorrow)
+        tomorrow = today + timedelta(days=1)
+        assert filters.ExistingData(s, Event, {}).dt["day"] == (
+            tomorrow - timedelta(days=30),
+            tomorrow,
+        )
+
+
+class Opt:
+    """Option counting the comparisons made to find it"""
+
+    compared = 0
+
+    def __init__(self, key: int) -> None:
+        self.key = key
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def __eq__(self, other):
+        Opt.compared += 1
+        return isinstance(other, Opt) and other.key == self.key
+
+
+def test_indexed_opts_lookup_skips_scan():
+    opts = filters.IndexedOpts([None, *(Opt(i) for i in range(10000))])
+    fk_opts = filters.IndexedOpts(filters.FkOpt(i, f"Name {i}") for i in range(10000))
+
+    Opt.compared = 0
+    assert opts.index_of(Opt(9999)) == 10000
+    assert Opt(5000) in opts
+    assert opts.index_of(Opt(10000)) is None
+    assert Opt.compared <= 2
+    assert fk_opts.index_of(9999) == 9999
+    assert filters.FkOpt(9999, "Other name") in fk_opts
@@ -0,0 +1,36 @@
+import pytest
+import streamlit as st
+from sqlalchemy import func, select
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+from streamlit.runtime.uploaded_file_manager import UploadedFile, UploadedFileRec
+
+from streamlit_sql.import_model import ImportRows
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+class Client(Base):
+    __tablename__ = "client"
+    id: Mapped[int] = mapped_column(primary_key=True)
+    name: Mapped[str | None]
+
+
+def csv_file(data: str):
+    record = UploadedFileRec("file_id", "clients.csv", "text/csv", data.encode())
+    return UploadedFile(record, None)  # pyright: ignore
+
+
+def test_import_rejects_file_without_model_columns(tmp_path):
+    conn = st.connection("sql", url=f"sqlite:///{tmp_path / 'import.db'}")
+    Base.metadata.create_all(conn.engine)
+    import_rows = ImportRows(conn, Client)
+
+    with pytest.raises(ValueError, match="No file column matches"):
+        import_rows.run(csv_file("nome,cidade\nAna,Rio\nBia,Recife\n"))
+
+    reports = import_rows.run(csv_file("Name,cidade\nAna,Rio\nBia,Recife\n"))
+    assert [report.inserted for report in reports] == [2]
+    with conn.session as s:
+        assert s.scalar(select(func.count()).select_from(Client)) == 2
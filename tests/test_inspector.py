@@ -0,0 +1,28 @@
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from streamlit_sql import inspector
+
+
+def test_failed_statement_not_recorded():
+    engine = create_engine("sqlite://")
+    recorder = inspector.start(engine)
+    with engine.connect() as c:
+        with pytest.raises(OperationalError):
+            c.execute(text("SELECT * FROM missing"))
+        c.execute(text("SELECT 1"))
+        assert inspector.START_ATTR not in c.info
+
+    records = inspector.stop(recorder, engine)
+    assert [record.sql for record in records] == ["SELECT 1"]
+    assert 0 <= records[0].seconds < 1
+
+
+def test_stopped_recorder_ignores_statements():
+    engine = create_engine("sqlite://")
+    recorder = inspector.start(engine)
+    inspector.stop(recorder, engine)
+    with engine.connect() as c:
+        c.execute(text("SELECT 1"))
+    assert recorder.records == []
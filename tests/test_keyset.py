@@ -0,0 +1,99 @@
+import enum
+
+import pytest
+from sqlalchemy import (
+    Column,
+    Enum,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    create_engine,
+    select,
+)
+from sqlalchemy.orm import Session
+
+from streamlit_sql import arrow, keyset
+
+metadata = MetaData()
+note = Table(
+    "note",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("text", String),
+)
+TEXTS = ["b", None, "a", "b", None, "c", "a"]
+
+
+def seek_pages(desc: bool) -> list[int]:
+    """Ids read page by page, each page seeking after the last row"""
+    engine = create_engine("sqlite://")
+    metadata.create_all(engine)
+    subq = select(note).subquery()
+    keys = [("text", desc), ("id", False)]
+    stmt = select(subq).order_by(*keyset.key_orderby(subq, keys)).limit(2)
+
+    ids: list[int] = []
+    with engine.begin() as c:
+        c.execute(note.insert(), [{"text": text} for text in TEXTS])
+        last = None
+        while True:
+            page = stmt
+            if last is not None:
+                page = stmt.where(keyset.seek_cond(subq, keys, last, True, False))
+            rows = c.execute(page).all()
+            if not rows:
+                return ids
+            ids.extend(row.id for row in rows)
+            last = (rows[-1].text, rows[-1].id)
+
+
+def test_seek_with_null_keys():
+    assert seek_pages(desc=False) == [3, 7, 1, 4, 6, 2, 5]
+    assert seek_pages(desc=True) == [2, 5, 6, 1, 4, 3, 7]
+
+
+def test_compare_keys_orders_null_last():
+    keys = [("text", False), ("id", False)]
+    assert keyset.compare_keys(keys, ("a", 3), (None, 2)) == -1
+    assert keyset.compare_keys(keys, (None, 2), (None, 5)) == -1
+    assert keyset.compare_keys([("text", True)], ("a",), (None,)) == 1
+
+
+class Level(enum.Enum):
+    a = "Zeta"
+    b = "Beta"
+    c = "Alpha"
+
+
+task = Table(
+    "task",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("level", Enum(Level)),
+)
+
+
+@pytest.mark.parametrize("arrow_fetch", [False, True])
+def test_enum_bookmarks_use_stored_names(arrow_fetch):
+    engine = create_engine("sqlite://")
+    metadata.create_all(engine)
+    subq = select(task).subquery()
+    stmt_no_pag = select(subq)
+    keys = [("level", False), ("id", False)]
+    levels = [Level.c, Level.a, Level.b] * 3
+
+    ids: list[int] = []
+    with engine.begin() as c:
+        c.execute(task.insert(), [{"level": level} for level in levels])
+        pag = keyset.KeysetPagination(
+            subq, keys, stmt_no_pag, len(levels), 2, "enum", enum_labels=arrow_fetch
+        )
+        with Session(bind=c) as s:
+            for page in range(1, 6):
+                stmt = pag.get_stmt_pag(s, page)
+                df = arrow.read_page(c, stmt, arrow_fetch)
+                ids.extend(pag.record(df, page).id)
+
+    # Ordered by the stored names a, b, c
+    assert ids == [2, 5, 8, 3, 6, 9, 1, 4, 7]
@@ -0,0 +1,22 @@
+import enum
+
+from streamlit_sql.columns import ColMeta
+from streamlit_sql.filters import IndexedOpts
+from streamlit_sql.params import NULL_PARAM, decode_index
+
+
+class Kind(enum.Enum):
+    a = "A"
+    b = "B"
+
+
+KIND = ColMeta("kind", "Kind", "enum", primary_key=False, coercion=None)
+
+
+def test_decode_enum_by_name():
+    existing = IndexedOpts([None, Kind.a, Kind.b])
+    assert decode_index(KIND, existing, "b") == 2
+    assert decode_index(KIND, existing, "a") == 1
+    assert decode_index(KIND, existing, NULL_PARAM) == 0
+    assert decode_index(KIND, existing, "A") is None
+    assert existing.name_positions is existing.name_positions
@@ -0,0 +1,26 @@
+from streamlit_sql.profiler import StageStats, StageTimer, percentile
+
+
+def test_nested_stages_are_exclusive(monkeypatch):
+    clock = iter([0.0, 1.0, 3.0, 4.0])
+    monkeypatch.setattr("streamlit_sql.profiler.perf_counter", lambda: next(clock))
+    timer = StageTimer()
+    with timer.stage("pagination"), timer.stage("count"):
+        pass
+    assert timer.timings == {"count": 2.0, "pagination": 2.0}
+
+
+def test_percentiles_in_stage_order():
+    stats = StageStats(samples=100)
+    for i in range(1, 201):
+        stats.add({"render": float(i), "bootstrap": 1.0})
+
+    result = stats.percentiles()
+    assert list(result) == ["bootstrap", "render"]
+    assert result["render"] == {
+        "p50": 150.0,
+        "p95": 195.0,
+        "p99": 199.0,
+        "samples": 100,
+    }
+    assert percentile([1.0], 99) == 1.0
@@ -0,0 +1,128 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import ForeignKey, Numeric, create_engine, func, select
+from sqlalchemy.orm import DeclarativeBase, Mapped, Session, mapped_column
+from sqlalchemy.sql.util import find_tables
+
+from streamlit_sql import arrow, read_cte
+from streamlit_sql.conditions import ColCond
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+class Client(Base):
+    __tablename__ = "client"
+    id: Mapped[int] = mapped_column(primary_key=True)
+    name: Mapped[str]
+
+
+class Invoice(Base):
+    __tablename__ = "invoice"
+    id: Mapped[int] = mapped_column(primary_key=True)
+    date: Mapped[date]
+    amount: Mapped[int]
+    client_id: Mapped[int] = mapped_column(ForeignKey("client.id"))
+
+
+BASE_STMT = select(Invoice.id, Invoice.date, Invoice.amount, Client.name).join(Client)
+COL_FILTER = SimpleNamespace(
+    no_dt_filters={"name": ColCond(values=("c1", "c2")), "amount": ColCond(lo=3)},
+    dt_filters={"date": (date(2020, 1, 10), None)},
+)
+
+
+def get_session():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = Session(engine)
+    session.add_all(Client(id=i, name=f"c{i}") for i in range(4))
+    session.add_all(
+        Invoice(
+            id=i,
+            date=date(2020, 1, 1) + timedelta(days=i % 30),
+            amount=i % 7,
+            client_id=i % 4,
+        )
+        for i in range(200)
+    )
+    session.commit()
+    return session
+
+
+def where_tables(stmt) -> set[str]:
+    return {t.name for t in find_tables(stmt.whereclause, check_columns=True)}
+
+
+def test_pushed_filters_reach_base_tables():
+    cte = BASE_STMT.cte()
+    pushed = read_cte.get_read_source(cte, COL_FILTER, BASE_STMT)
+    kept = read_cte.get_read_source(cte, COL_FILTER)
+
+    # Every filter is in the WHERE of the base Select, none is left outside
+    assert pushed.no_dt_filters == {}
+    assert pushed.dt_filters == {}
+    assert where_tables(pushed.from_.element) == {"client", "invoice"}
+    assert read_cte.get_stmt_no_pag(pushed).whereclause is None
+    assert "WHERE client.name IN" in str(read_cte.get_stmt_no_pag(pushed))
+
+    # Without base_stmt the filters are applied to the CTE
+    kept_where = read_cte.get_stmt_no_pag(kept).whereclause
+    assert kept_where is not None
+    assert cte in find_tables(kept_where, check_columns=True)
+
+    with get_session() as s:
+        pushed_rows = s.execute(read_cte.get_stmt_no_pag(pushed)).all()
+        kept_rows = s.execute(read_cte.get_stmt_no_pag(kept)).all()
+    assert len(pushed_rows) > 0
+    assert sorted(pushed_rows) == sorted(kept_rows)
+
+
+def test_keep_dt_filters_outside():
+    cte = BASE_STMT.cte()
+    source = read_cte.get_read_source(cte, COL_FILTER, BASE_STMT, keep_dt_filters=True)
+    assert source.dt_filters == COL_FILTER.dt_filters
+    assert source.no_dt_filters == {}
+
+
+def test_not_pushed_into_aggregates():
+    grouped = (
+        select(Client.name, func.sum(Invoice.amount).label("amount"))
+        .join(Client)
+        .group_by(Client.name)
+    )
+    assert read_cte.can_push_filters(BASE_STMT)
+    assert not read_cte.can_push_filters(grouped)
+    assert not read_cte.can_push_filters(BASE_STMT.limit(10))
+
+
+class Entry(Base):
+    __tablename__ = "entry"
+    id: Mapped[int] = mapped_column(primary_key=True)
+    amount: Mapped[Decimal | None] = mapped_column(Numeric(10, 2))
+
+
+@pytest.mark.parametrize("arrow_fetch", [False, True])
+@pytest.mark.parametrize(("offset", "expected"), [(0, 0.0), (2, 2.0), (3, 2.0)])
+def test_window_opening_balance_with_null_first_row(arrow_fetch, offset, expected):
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as s:
+        amounts = [None, 2, None, 3, 5]
+        s.add_all(Entry(id=i, amount=amount) for i, amount in enumerate(amounts, 1))
+        s.commit()
+
+    subq = select(Entry).subquery()
+    source = read_cte.ReadSource(subq, {}, {})
+    window = read_cte.get_stmt_no_pag_window(source, "amount", [("id", False)])
+    stmt = select(window).order_by(window.c.id).offset(offset).limit(2)
+    with engine.connect() as c:
+        df = arrow.read_page(c, stmt, arrow_fetch)
+
+    balance = df[read_cte.BALANCE_COLNAME]
+    opening = read_cte.window_opening_balance(balance, df["amount"])
+    assert opening == expected